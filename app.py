@@ -6,13 +6,14 @@ from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (LOG_LEVEL=DEBUG for verbose local output)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+from database import RoutingSession, READ_BIND, engine_options_from_env
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 
 # create the app
@@ -27,17 +28,69 @@ if database_url.startswith("postgresql://"):
     database_url = database_url.replace("postgresql://", "postgresql+psycopg2://", 1)
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-    "connect_args": {
-        "sslmode": "prefer"
-    } if database_url.startswith("postgresql") else {}
-}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(database_url)
+
+# Optional read replica: @read_only views read from DATABASE_READ_URL
+read_database_url = os.environ.get("DATABASE_READ_URL")
+if read_database_url:
+    if read_database_url.startswith("postgresql://"):
+        read_database_url = read_database_url.replace("postgresql://", "postgresql+psycopg2://", 1)
+    # DATABASE_READ_* settings (e.g. DATABASE_READ_POOL_SIZE) override DATABASE_* for the replica
+    read_engine_options = dict(engine_options_from_env(read_database_url, "DATABASE_READ"), url=read_database_url)
+    app.config["SQLALCHEMY_BINDS"] = {READ_BIND: read_engine_options}
+# Seconds a browser session keeps reading from the primary after it writes
+app.config['READ_AFTER_WRITE_SECONDS'] = int(os.environ.get("READ_AFTER_WRITE_SECONDS", "5"))
+
+# Tune SQLite for many concurrent readers and one writer (WAL, busy timeout, mmap)
+if database_url.startswith("sqlite") and os.environ.get("SQLITE_TUNING", "true").lower() in ("1", "true", "yes"):
+    from database import configure_sqlite, sqlite_pragmas_from_env
+    configure_sqlite(sqlite_pragmas_from_env())
 
 # Configure file uploads
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Processes used to parse multi-sheet / multi-file imports (1 parses in the request worker)
+app.config['IMPORT_WORKERS'] = int(os.environ.get("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+
+# Stream /employees, /billing and /hierarchy as they render instead of buffering the whole page
+app.config['STREAM_RENDERING'] = os.environ.get("STREAM_RENDERING", "false").lower() in ("1", "true", "yes")
+app.config['STREAM_BATCH_SIZE'] = int(os.environ.get("STREAM_BATCH_SIZE", "500"))
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get("STREAM_CHUNK_SIZE", "16384"))
+
+# Feedback and billing rows older than this many calendar years move to the archive tables
+app.config['ARCHIVE_HOT_YEARS'] = int(os.environ.get("ARCHIVE_HOT_YEARS", "2"))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+
+# Work done by wsgi.prewarm before gunicorn workers take traffic (see gunicorn.conf.py)
+app.config['PREWARM_ENABLED'] = os.environ.get("PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['PREWARM_DASHBOARDS'] = int(os.environ.get("PREWARM_DASHBOARDS", "20"))
+
+# Request instrumentation
+app.config['METRICS_ENABLED'] = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get("SLOW_REQUEST_MS", "1000"))
+# Query budget guard: off, warn (log N+1 patterns and overruns) or raise (fail the request)
+app.config['QUERY_GUARD'] = os.environ.get("QUERY_GUARD", "off").lower()
+app.config['QUERY_GUARD_REPEAT_THRESHOLD'] = int(os.environ.get("QUERY_GUARD_REPEAT_THRESHOLD", "3"))
+
+# Sampling profiler (off by default; PROFILE_SAMPLE_RATE=0.01 profiles 1% of requests)
+app.config['PROFILING_ENABLED'] = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+app.config['PROFILE_HEADER'] = os.environ.get("PROFILE_HEADER", "X-Profile")
+app.config['PROFILE_TOKEN'] = os.environ.get("PROFILE_TOKEN")
+app.config['PROFILE_DIR'] = os.environ.get("PROFILE_DIR", "profiles")
+app.config['PROFILE_COLLAPSED'] = os.environ.get("PROFILE_COLLAPSED", "false").lower() in ("1", "true", "yes")
+app.config['PROFILE_KEEP'] = int(os.environ.get("PROFILE_KEEP", "200"))
+
+# Shared cache: none, memory (per process), disk (per host; use /dev/shm for RAM) or redis
+app.config['CACHE_BACKEND'] = os.environ.get("CACHE_BACKEND", "none").lower()
+# Entries are unpickled, so the directory must be private to the app's user (checked on startup)
+app.config['CACHE_DIR'] = os.environ.get("CACHE_DIR", os.path.join(app.instance_path, "cache"))
+app.config['CACHE_REDIS_URL'] = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+app.config['CACHE_DEFAULT_TTL'] = int(os.environ.get("CACHE_DEFAULT_TTL", "300"))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+# Concurrent misses for one key wait (up to this many seconds) for a single computation
+app.config['CACHE_SINGLE_FLIGHT'] = os.environ.get("CACHE_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+app.config['CACHE_LOCK_TIMEOUT'] = float(os.environ.get("CACHE_LOCK_TIMEOUT", "30"))
 
 # initialize extensions
 db.init_app(app)
@@ -46,6 +99,15 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
+from instrumentation import init_instrumentation
+init_instrumentation(app, db)
+
+from database import init_read_routing
+init_read_routing(app, db)
+
+from cache import init_cache
+init_cache(app, db, RoutingSession)
+
 # Add min function to Jinja2 template context
 @app.context_processor
 def utility_processor():
@@ -56,14 +118,34 @@ def load_user(user_id):
     from models import Employee
     return Employee.query.get(int(user_id))
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
+def dispose_engines_after_fork():
+    """Drop pooled connections inherited from the parent process"""
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's sockets alone and just forgets them
+            engine.dispose(close=False)
+
+# Workers forked from a preloaded master must never reuse its connections
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+def create_app():
+    """Return the application ready to serve requests.
+
+    Importing this module does no database I/O; schema creation and sample
+    data are handled by ``flask --app app init-db``. Set AUTO_INIT_DB=1 to run
+    the same initialization on boot (handy for local development).
+    """
+    if os.environ.get("AUTO_INIT_DB", "").lower() in ("1", "true", "yes"):
+        from commands import init_database
+        init_database()
+    return app
 
-    # Create sample data if no users exist
-    from utils import create_sample_data
-    create_sample_data()
+# Import models, routes and CLI commands (no database access happens here)
+import models
+import routes
+import async_api
+import commands
 
-    # Import routes
-    import routes
\ No newline at end of file
+from profiling import init_profiling
+init_profiling(app)
@@ -0,0 +1,81 @@
+# archive.py
+import logging
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+from app import db
+from models import BillingDetail, BillingDetailArchive, Feedback, FeedbackArchive
+
+logger = logging.getLogger(__name__)
+
+# name -> (hot model, archive model, year column)
+ARCHIVED_TABLES = {
+    'feedback': (Feedback, FeedbackArchive, 'period_year'),
+    'billing': (BillingDetail, BillingDetailArchive, 'billing_year'),
+}
+
+def archive_horizon(today=None):
+    """First calendar year kept in the hot tables"""
+    year = (today or datetime.utcnow()).year
+    return year - max(current_app.config.get('ARCHIVE_HOT_YEARS', 2), 1) + 1
+
+def needs_history(year_from):
+    """Whether a query from year_from onwards (None: all years) has to read archived rows too"""
+    return year_from is None or year_from < archive_horizon()
+
+def _move(source, target, names, condition, batch_size, stamp=None):
+    """Move rows matching `condition` from source to target, one committed batch at a time.
+
+    Rows keep their ids. Each batch is copied and deleted in the same
+    transaction, so an interrupted run leaves every row in exactly one table
+    and the next run carries on from there.
+    """
+    columns = [source.__table__.c[name] for name in names]
+    if stamp is not None:
+        names, columns = names + ['archived_at'], columns + [literal(stamp)]
+
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(source.id).where(condition).order_by(source.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+        batch = condition & (source.id >= ids[0]) & (source.id <= ids[-1])
+        db.session.execute(insert(target).from_select(names, select(*columns).where(batch)))
+        db.session.execute(delete(source).where(batch).execution_options(synchronize_session=False))
+        db.session.commit()
+        moved += len(ids)
+        logger.info('Moved %d rows from %s to %s', moved, source.__tablename__, target.__tablename__)
+
+def archive_history(tables=None, batch_size=None, dry_run=False):
+    """Move rows older than the archive horizon out of the hot tables.
+
+    Archived rows that fall inside the horizon again (after ARCHIVE_HOT_YEARS
+    was raised) are moved back, so the hot tables always hold exactly the
+    current years and the run can be repeated safely.
+    """
+    horizon = archive_horizon()
+    batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 5000)
+    result = {'horizon': horizon, 'dry_run': dry_run, 'tables': {}}
+    for name in tables or ARCHIVED_TABLES:
+        hot, archive, year = ARCHIVED_TABLES[name]
+        names = [column.name for column in hot.__table__.columns]
+        old = getattr(hot, year) < horizon
+        if db.engine.dialect.name == 'sqlite':
+            # Tables created before AUTOINCREMENT was enabled hand out max(id) + 1, so keep
+            # the newest row hot or its id could be reused while an archived copy exists
+            old = old & (hot.id < select(func.max(hot.id)).scalar_subquery())
+        current = getattr(archive, year) >= horizon
+        if dry_run:
+            counts = {
+                'archived': db.session.scalar(select(func.count()).select_from(hot).where(old)),
+                'restored': db.session.scalar(select(func.count()).select_from(archive).where(current)),
+            }
+        else:
+            counts = {
+                'archived': _move(hot, archive, names, old, batch_size, stamp=datetime.utcnow()),
+                'restored': _move(archive, hot, names, current, batch_size),
+            }
+        result['tables'][name] = counts
+    return result
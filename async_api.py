@@ -0,0 +1,107 @@
+# async_api.py
+import asyncio
+import importlib.util
+import logging
+from flask import jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import func, select, union
+from sqlalchemy.pool import NullPool
+from app import app, db
+from models import Employee
+
+logger = logging.getLogger(__name__)
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+_engine = None
+
+def get_async_engine():
+    """Process-wide async engine for the primary database.
+
+    Flask runs each async view in its own event loop, and asyncio connections
+    cannot move between loops, so pooling is disabled here.
+    """
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = db.engine.url
+        if url.drivername not in ASYNC_DRIVERS:
+            raise RuntimeError(f'No async driver configured for {url.drivername}')
+        _engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS[url.drivername]), poolclass=NullPool)
+    return _engine
+
+def _scope_ids(user_id, is_manager, subordinates_cte):
+    """Selectable of the ids visible on the user's dashboard"""
+    me = select(Employee.id).where(Employee.id == user_id)
+    if not is_manager:
+        return me.subquery()
+    return union(select(subordinates_cte.c.id), me).subquery()
+
+async def _fetch(engine, statement):
+    async with engine.connect() as conn:
+        result = await conn.execute(statement)
+        return result.all()
+
+async def dashboard_analytics_async(user_id, is_manager, subordinates_cte):
+    """Same payload as utils.get_dashboard_analytics, computed with concurrent SQL aggregates"""
+    engine = get_async_engine()
+    scope = _scope_ids(user_id, is_manager, subordinates_cte)
+    in_scope = Employee.id.in_(select(scope.c.id))
+
+    def grouped(column):
+        label = func.coalesce(column, 'Unknown')
+        return select(label, func.count()).where(in_scope).group_by(label)
+
+    fields = ['employment_type', 'billable_status', 'location', 'team']
+    queries = [grouped(getattr(Employee, field)) for field in fields]
+    queries.append(select(Employee.skill).where(in_scope, Employee.skill.isnot(None)))
+    results = await asyncio.gather(*(_fetch(engine, query) for query in queries))
+
+    analytics = {field: {key: count for key, count in rows} for field, rows in zip(fields, results)}
+    analytics['total_employees'] = sum(analytics['employment_type'].values())
+    skills = {}
+    for (skill_list,) in results[-1]:
+        for skill in skill_list.split(','):
+            skill = skill.strip()
+            if skill:
+                skills[skill] = skills.get(skill, 0) + 1
+    analytics['skills'] = skills
+    return analytics
+
+def register_async_routes():
+    """Add the /api/async/* variants when Flask's async support is installed"""
+    if importlib.util.find_spec('asgiref') is None:
+        logger.info('asgiref not installed; async API routes disabled (pip install "flask[async]")')
+        return
+
+    @app.route('/api/async/dashboard_data')
+    @login_required
+    async def async_dashboard_data():
+        # Resolve the user synchronously before handing off to the event loop
+        user_id, is_manager = current_user.id, current_user.is_manager
+        subordinates = current_user.subordinates_cte() if is_manager else None
+        analytics = await dashboard_analytics_async(user_id, is_manager, subordinates)
+        return jsonify(analytics)
+
+    @app.route('/api/async/employee/<int:id>')
+    @login_required
+    async def async_employee_details(id):
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        user_id, is_manager = current_user.id, current_user.is_manager
+        async with AsyncSession(get_async_engine()) as session:
+            employee = await session.get(Employee, id)
+            if employee is None:
+                return jsonify({'error': 'Not found'}), 404
+            # Same rule as /api/employee/<id>: managers may view anyone, others only themselves
+            if not is_manager and user_id != employee.id:
+                return jsonify({'error': 'Access denied'}), 403
+            return jsonify(employee.to_dict())
+
+register_async_routes()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare concurrent throughput of the sync and async dashboard/employee APIs.
+
+Serves the app with a threaded WSGI server, logs in as a synthetic manager and
+fires requests from a pool of client threads at each endpoint in turn.
+
+    python -m benchmarks.async_load --employees 10000 --concurrency 16 --requests 400
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+PAIRS = [
+    ('/api/dashboard_data', '/api/async/dashboard_data'),
+    ('/api/employee/{employee_id}', '/api/async/employee/{employee_id}'),
+]
+
+def login(base_url, email, password):
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    data = urllib.parse.urlencode({'email': email, 'password': password}).encode()
+    try:
+        opener.open(f'{base_url}/login', data)
+    except urllib.error.HTTPError:
+        pass  # the redirect target may not render here; the session cookie is what we need
+    return opener
+
+def hammer(opener, url, total, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        with opener.open(url) as response:
+            response.read()
+            return time.perf_counter() - started, response.status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(r[0] for r in results)
+    return {
+        'requests': total,
+        'errors': sum(1 for r in results if r[1] != 200),
+        'requests_per_sec': round(total / elapsed, 1),
+        'median_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--port', type=int, default=5057)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.gettempdir(), f'portal_async_{args.employees}.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{path}')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import logging
+    logging.disable(logging.WARNING)
+    from werkzeug.serving import make_server
+    from app import app, db
+    from models import Employee
+    from synthetic_org import generate_org
+
+    with app.app_context():
+        db.create_all()
+        root = Employee.query.filter(Employee.emailid.like('%@synthetic.example'),
+                                     Employee.manager_id.is_(None)).first()
+        root_id = root.id if root else generate_org(size=args.employees, feedback_years=1,
+                                                    billing_months=1)['root_id']
+        manager = Employee.query.filter_by(manager_id=root_id, is_manager=True).first()
+        email = manager.emailid
+        employee_id = Employee.query.filter_by(manager_id=manager.id).first().id
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{args.port}'
+    opener = login(base_url, email, 'password123')
+
+    results = {}
+    try:
+        for sync_path, async_path in PAIRS:
+            for path in (sync_path, async_path):
+                url = base_url + path.format(employee_id=employee_id)
+                hammer(opener, url, args.concurrency, args.concurrency)  # warm-up
+                results[path] = hammer(opener, url, args.requests, args.concurrency)
+                r = results[path]
+                print(f"{path:40} {r['requests_per_sec']:>8} req/s  median {r['median_ms']:>8} ms  "
+                      f"p95 {r['p95_ms']:>8} ms  errors {r['errors']}")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    return results
+
+if __name__ == '__main__':
+    main()
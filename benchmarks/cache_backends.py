@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Measure the shared cache backends and check cross-worker invalidation.
+
+Times get/set round trips for the memory, disk and Redis-protocol backends,
+then bumps the data version from a separate process and checks whether this
+process stops seeing the old entries. Without --redis-url a small in-process
+RESP server stands in for Redis.
+
+    python -m benchmarks.cache_backends --operations 5000
+    python -m benchmarks.cache_backends --redis-url redis://localhost:6379/0
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAYLOAD = {
+    'skills': {f'skill{i}': i for i in range(40)},
+    'employment_type': {'Full Time': 900, 'Contract': 100},
+    'location': {f'city{i}': i * 10 for i in range(20)},
+    'team': {f'team{i}': i for i in range(30)},
+    'total_employees': 1000,
+}
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """GET, SET [NX] [EX|PX], DEL, INCR, AUTH, SELECT and PING against a shared dict (no expiry)"""
+
+    def handle(self):
+        store, lock = self.server.store, self.server.lock
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].upper()
+            with lock:
+                if command == b'GET':
+                    value = store.get(args[1])
+                    reply = b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+                elif command == b'SET':
+                    if b'NX' in (arg.upper() for arg in args[3:]) and args[1] in store:
+                        reply = b'$-1\r\n'
+                    else:
+                        store[args[1]] = args[2]
+                        reply = b'+OK\r\n'
+                elif command == b'DEL':
+                    reply = b':%d\r\n' % (store.pop(args[1], None) is not None)
+                elif command == b'INCR':
+                    store[args[1]] = b'%d' % (int(store.get(args[1], b'0')) + 1)
+                    reply = b':%s\r\n' % store[args[1]]
+                elif command in (b'AUTH', b'SELECT', b'PING'):
+                    reply = b'+OK\r\n'
+                else:
+                    reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+class _RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _RespHandler)
+        self.store, self.lock = {}, threading.Lock()
+
+def start_stand_in_server():
+    server = _RespServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+def time_operations(cache, operations):
+    set_times, get_times = [], []
+    for i in range(operations):
+        key = f'bench:{i % 256}'
+        started = time.perf_counter()
+        cache.set(key, PAYLOAD)
+        set_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        cache.get(key)
+        get_times.append(time.perf_counter() - started)
+    return {
+        'set_median_us': round(statistics.median(set_times) * 1e6, 1),
+        'get_median_us': round(statistics.median(get_times) * 1e6, 1),
+        'hit_ratio': round(cache.hits / max(cache.hits + cache.misses, 1), 3),
+    }
+
+def _bump_in_other_process(config):
+    from cache import AppCache, create_backend
+    AppCache(create_backend(config)).bump_version()
+
+def check_invalidation(config):
+    """True when a version bump in another process hides this process's entries"""
+    from cache import AppCache, create_backend
+    cache = AppCache(create_backend(config))
+    cache.set('invalidation-probe', 'stale')
+    worker = multiprocessing.get_context('spawn').Process(target=_bump_in_other_process, args=(config,))
+    worker.start()
+    worker.join()
+    return cache.get('invalidation-probe') is None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--redis-url', help='benchmark a real Redis server instead of the stand-in')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    from cache import AppCache, create_backend
+
+    server = None
+    if args.redis_url:
+        redis_url = args.redis_url
+    else:
+        server, redis_url = start_stand_in_server()
+    configs = {
+        'memory': {'CACHE_BACKEND': 'memory'},
+        'disk': {'CACHE_BACKEND': 'disk', 'CACHE_DIR': tempfile.mkdtemp(prefix='portal-cache-')},
+        'redis': {'CACHE_BACKEND': 'redis', 'CACHE_REDIS_URL': redis_url},
+    }
+
+    results = {}
+    try:
+        for name, config in configs.items():
+            result = time_operations(AppCache(create_backend(config)), args.operations)
+            result['invalidated_across_processes'] = check_invalidation(config)
+            results[name] = result
+            print(f"{name:8} set {result['set_median_us']:>8} us  get {result['get_median_us']:>8} us  "
+                  f"hit ratio {result['hit_ratio']}  cross-process invalidation "
+                  f"{'yes' if result['invalidated_across_processes'] else 'no'}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Time a multi-sheet Excel import with different numbers of parsing processes.
+
+Builds one workbook with a sheet per location, then imports it with
+process_excel_file(all_sheets=True) for each worker count, removing the
+imported rows between runs. Parsing should scale with cores; the single
+duplicate check and insert stage does not.
+
+    python -m benchmarks.import_parsing --sheets 8 --rows 5000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+def build_workbook(path, sheets, rows):
+    import pandas as pd
+
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet in range(sheets):
+            pd.DataFrame([{
+                'Employment_Type': 'Permanent',
+                'Billable_Status': 'Billable',
+                'Employee_Status': 'Active',
+                'System_ID': f'PARSE{sheet:02d}{i:06d}',
+                'Full_Name': f'Parse Bench {sheet}-{i}',
+                'Skill': 'Python, SQL',
+                'Team': 'UFS',
+                'DOJ_Allianz': '2024-01-15',
+                'Emailid': f'parse{sheet}.{i}@synthetic.example',
+                'Location': f'Location {sheet}',
+                'Billing_Rate': 50.0,
+            } for i in range(rows)]).to_excel(writer, sheet_name=f'Location {sheet}', index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=5000, help='rows per sheet')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='portal-import-bench-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app, db
+    from models import Employee
+    from utils import process_excel_file
+
+    workbook = os.path.join(workdir, 'vendor.xlsx')
+    started = time.perf_counter()
+    build_workbook(workbook, args.sheets, args.rows)
+    print(f'Built {args.sheets} x {args.rows} rows ({os.path.getsize(workbook) // 1024} KiB) '
+          f'in {time.perf_counter() - started:.1f}s')
+
+    results = {}
+    with app.app_context():
+        db.create_all()
+        manager = Employee(full_name='Import Bench', emailid='import.bench@synthetic.example', is_manager=True)
+        manager.set_password('password123')
+        db.session.add(manager)
+        db.session.commit()
+
+        for workers in args.workers:
+            started = time.perf_counter()
+            outcome = process_excel_file(workbook, manager.id, all_sheets=True, workers=workers)
+            elapsed = time.perf_counter() - started
+            Employee.query.filter(Employee.system_id.like('PARSE%')).delete(synchronize_session=False)
+            db.session.commit()
+            results[workers] = {'seconds': round(elapsed, 2), 'imported': outcome['count'],
+                                'success': outcome['success']}
+            print(f"workers={workers:<3} {elapsed:8.2f} s  imported {outcome['count']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Time the portal's hot paths against a synthetic organization.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run_benchmarks --employees 10000 --output bench-10k.json
+    python -m benchmarks.run_benchmarks --employees 10000 --reuse --compare bench-10k.json
+
+Results are written as JSON so runs from different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+ENDPOINTS = ['/dashboard', '/api/dashboard_data', '/employees', '/hierarchy', '/billing']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000, help='synthetic org size')
+    parser.add_argument('--depth', type=int, default=6, help='management levels below the root')
+    parser.add_argument('--feedback-years', type=int, default=2)
+    parser.add_argument('--billing-months', type=int, default=12)
+    parser.add_argument('--iterations', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--import-rows', type=int, default=500, help='rows in the generated Excel import')
+    parser.add_argument('--database-url', help='defaults to a SQLite file in the temp directory')
+    parser.add_argument('--reuse', action='store_true', help='reuse an already seeded database')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='print median deltas against a previous JSON result')
+    return parser.parse_args(argv)
+
+def summarize(samples, statements=None):
+    """Reduce a list of durations (seconds) to milliseconds statistics"""
+    ordered = sorted(samples)
+    result = {
+        'runs': len(samples),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+    if statements is not None:
+        result['sql_statements'] = statements
+    return result
+
+def pick_users(db, Employee, root_id):
+    """Choose a root manager, a mid-level manager and a leaf employee to act as"""
+    root = db.session.get(Employee, root_id)
+    first_level = db.session.query(Employee.id).filter(Employee.manager_id == root.id)
+    mid = (Employee.query.filter(Employee.manager_id.in_(first_level), Employee.is_manager.is_(True))
+           .order_by(Employee.id).first())
+    leaf = Employee.query.filter(Employee.is_manager.is_(False)).order_by(Employee.id.desc()).first()
+    return {'root': root.id, 'mid': mid.id if mid else root.id, 'leaf': leaf.id}
+
+def time_endpoint(app, metrics, user_id, path, iterations):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    response = client.get(path)  # warm-up (template compile, caches)
+    samples = []
+    metrics.reset()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        samples.append(time.perf_counter() - started)
+    statements = None
+    for histogram in metrics.sql_count.values():
+        statements = round(histogram.sum / histogram.count, 1)
+    result = summarize(samples, statements)
+    result['status'] = response.status_code
+    result['bytes'] = len(response.get_data())
+    return result
+
+def time_can_manage(db, Employee, users, iterations):
+    results = {}
+    for label, (manager_id, employee_id) in {
+        'root_to_leaf': (users['root'], users['leaf']),
+        'mid_to_leaf': (users['mid'], users['leaf']),
+    }.items():
+        manager = db.session.get(Employee, manager_id)
+        employee = db.session.get(Employee, employee_id)
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            manager.can_manage(employee)
+            samples.append(time.perf_counter() - started)
+        results[label] = summarize(samples)
+    return results
+
+def build_import_workbook(rows):
+    import pandas as pd
+
+    run = datetime.now().strftime('%H%M%S')
+    df = pd.DataFrame([{
+        'Employment_Type': 'Permanent',
+        'Billable_Status': 'Billable',
+        'Employee_Status': 'Active',
+        'System_ID': f'BENCH{run}{i:06d}',
+        'Full_Name': f'Bench Import {i}',
+        'Skill': 'Python, SQL',
+        'Team': 'UFS',
+        'DOJ_Allianz': '2024-01-15',
+        'Emailid': f'bench{run}{i}@synthetic.example',
+        'Location': 'Bangalore',
+        'Billing_Rate': '50.00',
+    } for i in range(rows)])
+    output = BytesIO()
+    df.to_excel(output, index=False)
+    output.seek(0)
+    return output
+
+def time_import(db, Employee, process_excel_file, manager_id, rows):
+    workbook = build_import_workbook(rows)
+    started = time.perf_counter()
+    outcome = process_excel_file(workbook, manager_id)
+    elapsed = time.perf_counter() - started
+    # Remove the imported rows so repeated runs see the same database
+    Employee.query.filter(Employee.system_id.like('BENCH%')).delete(synchronize_session=False)
+    db.session.commit()
+    result = summarize([elapsed])
+    result.update({'rows': rows, 'imported': outcome['count'], 'success': outcome['success']})
+    return result
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous_path, current):
+    with open(previous_path) as f:
+        previous = json.load(f)['results']
+    print(f"\n{'benchmark':40} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current.items():
+        before = previous.get(name)
+        if not before or 'median_ms' not in before:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        print(f"{name:40} {before['median_ms']:>10.2f} {result['median_ms']:>10.2f} {change:>+7.1f}%")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    elif not os.environ.get('DATABASE_URL'):
+        path = os.path.join(tempfile.gettempdir(), f'portal_bench_{args.employees}.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+        if not args.reuse and os.path.exists(path):
+            os.remove(path)
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import app, db
+    from models import Employee
+    from instrumentation import metrics
+    from synthetic_org import generate_org
+    from utils import process_excel_file
+
+    with app.app_context():
+        db.create_all()
+        root = Employee.query.filter(Employee.emailid.like('%@synthetic.example'),
+                                     Employee.manager_id.is_(None)).first()
+        if root is None or not args.reuse:
+            started = time.perf_counter()
+            summary = generate_org(size=args.employees, depth=args.depth,
+                                   feedback_years=args.feedback_years,
+                                   billing_months=args.billing_months)
+            print(f"Seeded {summary['employees']} employees in {time.perf_counter() - started:.1f}s")
+            root_id = summary['root_id']
+        else:
+            root_id = root.id
+        users = pick_users(db, Employee, root_id)
+
+    results = {}
+    for role in ('root', 'mid', 'leaf'):
+        for path in ENDPOINTS:
+            name = f'{role} GET {path}'
+            results[name] = time_endpoint(app, metrics, users[role], path, args.iterations)
+            print(f"{name:40} {results[name]['median_ms']:>10.2f} ms  "
+                  f"({results[name].get('sql_statements')} SQL, HTTP {results[name]['status']})")
+
+    with app.app_context():
+        for label, result in time_can_manage(db, Employee, users, args.iterations).items():
+            results[f'can_manage {label}'] = result
+            print(f"{'can_manage ' + label:40} {result['median_ms']:>10.2f} ms")
+        root_manager = users['root']
+        result = time_import(db, Employee, process_excel_file, root_manager, args.import_rows)
+        results['process_excel_file'] = result
+        print(f"{'process_excel_file':40} {result['median_ms']:>10.2f} ms  ({result['imported']} rows)")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+            'employees': args.employees,
+            'depth': args.depth,
+            'iterations': args.iterations,
+            'users': users,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+    if args.compare:
+        compare(args.compare, results)
+    return report
+
+if __name__ == '__main__':
+    main()
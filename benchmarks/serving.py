@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Compare the development server with the gunicorn production profile.
+
+Starts `python main.py`'s server (debug mode, threaded; the reloader is
+disabled so there is a single process to measure) and then
+`gunicorn -c gunicorn.conf.py` against the same synthetic database. For each
+it records the latency of the very first request to every endpoint (what
+prewarming is for) and then the throughput of --concurrency clients.
+
+Both servers use CACHE_BACKEND=memory unless CACHE_BACKEND is set.
+
+    python -m benchmarks.serving --employees 10000 --concurrency 16 --requests 400
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.async_load import hammer
+
+PATHS = (
+    '/api/dashboard_data',
+    '/api/employee/{employee_id}',
+    '/api/employees/search?q=engineer',
+    '/api/hierarchy/rollup',
+)
+
+DEV_SERVER = "from main import app; app.run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)"
+
+def commands(port):
+    return {
+        'dev server': [sys.executable, '-c', DEV_SERVER.format(port=port)],
+        'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+    }
+
+def wait_for_port(port, process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not listen on {port} within {timeout}s')
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def login(base_url, email, password):
+    """Log in without following the redirect, which would render (and warm) the dashboard"""
+    jar = CookieJar()
+    data = urllib.parse.urlencode({'email': email, 'password': password}).encode()
+    try:
+        urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect).open(f'{base_url}/login', data)
+    except urllib.error.HTTPError:
+        pass  # the 302 to the dashboard
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+def first_request_ms(opener, url):
+    started = time.perf_counter()
+    with opener.open(url) as response:
+        response.read()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def measure(command, env, port, email, employee_id, args):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+        base_url = f'http://127.0.0.1:{port}'
+        opener = login(base_url, email, 'password123')
+        urls = {path: base_url + path.format(employee_id=employee_id) for path in PATHS}
+        results = {}
+        # Cold first requests before anything else touches the endpoints
+        for path, url in urls.items():
+            results[path] = {'first_ms': first_request_ms(opener, url)}
+        for path, url in urls.items():
+            results[path].update(hammer(opener, url, args.requests, args.concurrency))
+        return results
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--port', type=int, default=5060)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.gettempdir(), f'portal_serving_{args.employees}.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{path}')
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app, db
+    from models import Employee
+    from synthetic_org import generate_org
+
+    with app.app_context():
+        db.create_all()
+        root = Employee.query.filter(Employee.emailid.like('%@synthetic.example'),
+                                     Employee.manager_id.is_(None)).first()
+        root_id = root.id if root else generate_org(size=args.employees, feedback_years=1,
+                                                    billing_months=1)['root_id']
+        manager = Employee.query.filter_by(manager_id=root_id, is_manager=True).first()
+        email = manager.emailid
+        employee_id = Employee.query.filter_by(manager_id=manager.id).first().id
+
+    env = dict(os.environ, AUTO_INIT_DB='0')
+    results = {}
+    for label, command in commands(args.port).items():
+        results[label] = measure(command, env, args.port, email, employee_id, args)
+        for path, r in results[label].items():
+            print(f"{label:10} {path:34} first {r['first_ms']:>8} ms  {r['requests_per_sec']:>8} req/s  "
+                  f"median {r['median_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  errors {r['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    return results
+
+if __name__ == '__main__':
+    main()
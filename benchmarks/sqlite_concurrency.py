@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Measure SQLite read throughput while a bulk import is writing.
+
+Runs each scenario twice on a fresh database file: once with the tuning layer
+(WAL, busy_timeout, ...) and once with SQLITE_TUNING=false. Reader processes
+hammer /api/dashboard_data through the test client, first with no writer
+("idle") and then while another process bulk-inserts a synthetic org
+("import").
+
+    python -m benchmarks.sqlite_concurrency --employees 5000 --import-employees 50000 --readers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _load_app(env):
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import app
+    return app
+
+def reader(env, user_id, stop, results):
+    app = _load_app(env)
+    app.config['TESTING'] = False
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    ok = errors = 0
+    worst = 0.0
+    started = time.perf_counter()
+    while not stop.is_set():
+        request_started = time.perf_counter()
+        try:
+            status = client.get('/api/dashboard_data').status_code
+        except Exception:  # e.g. "database is locked" escaping the 500 handler
+            status = None
+        worst = max(worst, time.perf_counter() - request_started)
+        if status == 200:
+            ok += 1
+        else:
+            errors += 1
+    results.put({'ok': ok, 'errors': errors, 'seconds': time.perf_counter() - started, 'worst_ms': worst * 1000})
+
+def importer(env, size):
+    app = _load_app(env)
+    from synthetic_org import generate_org
+    with app.app_context():
+        generate_org(size=size, depth=5, feedback_years=1, billing_months=3, seed=7)
+
+def seed(env, size):
+    app = _load_app(env)
+    from app import db
+    from models import Employee
+    from synthetic_org import generate_org
+    with app.app_context():
+        db.create_all()
+        root_id = generate_org(size=size, depth=5, feedback_years=1, billing_months=3)['root_id']
+        # Act as the first manager below the root: a realistic, mid-sized scope
+        manager = Employee.query.filter_by(manager_id=root_id, is_manager=True).first()
+        return manager.id if manager else root_id
+
+def run_phase(ctx, env, user_id, readers, duration=None, import_size=None):
+    stop = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=reader, args=(env, user_id, stop, results)) for _ in range(readers)]
+    for proc in procs:
+        proc.start()
+    time.sleep(2)  # let readers import the app before measuring the writer
+    import_seconds = None
+    if import_size:
+        writer = ctx.Process(target=importer, args=(env, import_size))
+        started = time.perf_counter()
+        writer.start()
+        writer.join()
+        import_seconds = time.perf_counter() - started
+    else:
+        time.sleep(duration)
+    stop.set()
+    totals = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    ok = sum(t['ok'] for t in totals)
+    seconds = max(t['seconds'] for t in totals)
+    return {
+        'reads': ok,
+        'errors': sum(t['errors'] for t in totals),
+        'reads_per_sec': round(ok / seconds, 1) if seconds else 0,
+        'worst_read_ms': round(max(t['worst_ms'] for t in totals), 1),
+        'import_seconds': round(import_seconds, 2) if import_seconds else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=5000, help='employees seeded before reading')
+    parser.add_argument('--import-employees', type=int, default=50000, help='employees inserted by the writer')
+    parser.add_argument('--readers', type=int, default=4, help='concurrent reader processes')
+    parser.add_argument('--idle-seconds', type=float, default=5)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context('spawn')
+    report = {'config': vars(args), 'results': {}}
+    for label, tuning in (('tuned', 'true'), ('untuned', 'false')):
+        path = os.path.join(tempfile.gettempdir(), f'portal_concurrency_{label}.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        env = {'DATABASE_URL': f'sqlite:///{path}', 'SQLITE_TUNING': tuning, 'METRICS_ENABLED': 'false'}
+        with ctx.Pool(1) as pool:
+            user_id = pool.apply(seed, (env, args.employees))
+        idle = run_phase(ctx, env, user_id, args.readers, duration=args.idle_seconds)
+        during_import = run_phase(ctx, env, user_id, args.readers, import_size=args.import_employees)
+        report['results'][label] = {'idle': idle, 'import': during_import}
+        print(f"{label:8} idle: {idle['reads_per_sec']:>8} reads/s ({idle['errors']} errors)   "
+              f"import: {during_import['reads_per_sec']:>8} reads/s ({during_import['errors']} errors, "
+              f"worst {during_import['worst_read_ms']} ms, import {during_import['import_seconds']} s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Check that simultaneous dashboard misses are computed once.
+
+Threads: serves the app with a threaded WSGI server, invalidates the cache,
+then fires --clients simultaneous /api/dashboard_data requests for the same
+manager and reports how many analytics computations they caused, with and
+without single-flight.
+
+Processes: starts --processes workers that share a disk or Redis-protocol
+backend (an in-process stand-in server unless --redis-url is given) and call
+get_or_set on the same key at the same moment.
+
+Exits non-zero when a coalesced run (threads with single-flight, or either
+shared backend across processes) computes the value more than once or a
+request fails, so it can run as a regression check.
+
+    python -m benchmarks.stampede --employees 20000 --clients 32 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.async_load import login
+from benchmarks.cache_backends import start_stand_in_server
+
+def thread_stampede(base_url, opener, cache, clients, single_flight):
+    cache.single_flight = single_flight
+    cache.bump_version()
+    before = cache.computations
+    barrier = threading.Barrier(clients)
+
+    def one(_):
+        barrier.wait()
+        with opener.open(f'{base_url}/api/dashboard_data') as response:
+            response.read()
+            return response.status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        statuses = list(pool.map(one, range(clients)))
+    return {
+        'requests': clients,
+        'errors': sum(1 for status in statuses if status != 200),
+        'computations': cache.computations - before,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def _slow_value():
+    time.sleep(0.5)
+    return os.getpid()
+
+def _process_worker(config, start_at):
+    from cache import AppCache, create_backend
+    cache = AppCache(create_backend(config))
+    time.sleep(max(start_at - time.time(), 0))
+    cache.get_or_set('stampede-probe', _slow_value)
+    return cache.computations
+
+def process_stampede(config, processes):
+    from cache import AppCache, create_backend
+    AppCache(create_backend(config)).bump_version()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        # Start together once every worker has had time to import
+        start_at = time.time() + 3
+        computations = pool.starmap(_process_worker, [(config, start_at)] * processes)
+    return {'processes': processes, 'computations': sum(computations)}
+
+def coalescing_failures(results):
+    """Descriptions of the coalesced runs that computed more than once or had errors"""
+    failures = []
+    r = results['threads'].get('single-flight')
+    if r and (r['computations'] > 1 or r['errors']):
+        failures.append(f"threads single-flight: {r['computations']} computations, {r['errors']} errors")
+    for name, r in results['processes'].items():
+        if r['computations'] > 1:
+            failures.append(f"processes {name}: {r['computations']} computations")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5058)
+    parser.add_argument('--redis-url', help='use a real Redis server for the process check')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.gettempdir(), f'portal_stampede_{args.employees}.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{path}')
+    # With no backend nothing is stored, so requests arriving after the flight recompute
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    import logging
+    logging.disable(logging.WARNING)
+    from werkzeug.serving import make_server
+    from app import app, db
+    from cache import cache
+    from models import Employee
+    from synthetic_org import generate_org
+
+    with app.app_context():
+        db.create_all()
+        root = Employee.query.filter(Employee.emailid.like('%@synthetic.example'),
+                                     Employee.manager_id.is_(None)).first()
+        if root is None:
+            root = db.session.get(Employee, generate_org(size=args.employees, feedback_years=1,
+                                                         billing_months=1)['root_id'])
+        email = root.emailid
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{args.port}'
+    opener = login(base_url, email, 'password123')
+
+    results = {'threads': {}, 'processes': {}}
+    try:
+        for single_flight in (False, True):
+            label = 'single-flight' if single_flight else 'uncoalesced'
+            r = results['threads'][label] = thread_stampede(base_url, opener, cache, args.clients, single_flight)
+            print(f"threads   {label:14} {r['requests']} requests -> {r['computations']} computations "
+                  f"in {r['seconds']} s  errors {r['errors']}")
+    finally:
+        server.shutdown()
+
+    stand_in = None
+    if args.redis_url:
+        redis_url = args.redis_url
+    else:
+        stand_in, redis_url = start_stand_in_server()
+    try:
+        for name, config in (('disk', {'CACHE_BACKEND': 'disk', 'CACHE_DIR': tempfile.mkdtemp(prefix='portal-cache-')}),
+                             ('redis', {'CACHE_BACKEND': 'redis', 'CACHE_REDIS_URL': redis_url})):
+            r = results['processes'][name] = process_stampede(config, args.processes)
+            print(f"processes {name:14} {r['processes']} workers -> {r['computations']} computations")
+    finally:
+        if stand_in is not None:
+            stand_in.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    failures = coalescing_failures(results)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        raise SystemExit(1)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Compare buffered and streamed rendering of the large list pages.
+
+Serves the app with a threaded WSGI server, logs in as the root of a
+synthetic org and fetches /employees, /billing and /hierarchy with
+STREAM_RENDERING off and on. Reports time to first byte and total time, and
+(in a separate tracemalloc run) the peak Python memory allocated while
+serving each page.
+
+If the application templates are not installed, minimal stand-ins that
+render every row are used so the comparison still exercises the same
+queries and per-row output.
+
+    python -m benchmarks.streaming --employees 50000
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.async_load import login
+
+PAGES = ('/employees', '/billing', '/hierarchy')
+
+# Like the real layout, show (and so consume) flashed messages; pages with pending ones are never streamed
+_FLASHES = '{% for message in get_flashed_messages() %}<p>{{ message }}</p>{% endfor %}'
+
+STAND_IN_TEMPLATES = {
+    'employees.html': _FLASHES + '<table>{% for e in employees %}<tr><td>{{ e.system_id }}</td><td>{{ e.full_name }}</td>'
+                      '<td>{{ e.emailid }}</td><td>{{ e.designation }}</td><td>{{ e.location }}</td>'
+                      '<td>{{ e.manager.full_name if e.manager }}</td></tr>\n{% endfor %}</table>',
+    'billing.html': _FLASHES + '<table>{% for b in billing_records %}<tr><td>{{ b.employee.full_name }}</td>'
+                    '<td>{{ b.billing_year }}-{{ b.billing_month }}</td><td>{{ b.billing_rate }}</td></tr>\n'
+                    '{% endfor %}</table>',
+    'hierarchy.html': '{% macro node(e) %}<li>{{ e.full_name }} ({{ rollups[e.id].headcount }})'
+                      '{% if e.direct_reports %}<ul>{% for r in e.direct_reports %}{{ node(r) }}{% endfor %}</ul>'
+                      '{% endif %}</li>\n{% endmacro %}' + _FLASHES + '<ul>{% for m in top_managers %}{{ node(m) }}{% endfor %}</ul>',
+}
+
+def fetch(port, path, cookie):
+    """(seconds to first body byte, total seconds, body bytes) for one GET"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    started = time.perf_counter()
+    connection.request('GET', path, headers={'Cookie': cookie})
+    response = connection.getresponse()
+    first = response.read(1)
+    first_byte = time.perf_counter() - started
+    size = len(first)
+    while chunk := response.read(65536):
+        size += len(chunk)
+    total = time.perf_counter() - started
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'{path} returned {response.status}')
+    return first_byte, total, size
+
+def measure(port, path, cookie):
+    first_byte, total, size = fetch(port, path, cookie)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fetch(port, path, cookie)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'ttfb_ms': round(first_byte * 1000, 1), 'total_ms': round(total * 1000, 1),
+            'bytes': size, 'peak_mib': round(peak / 2 ** 20, 1)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=50000)
+    parser.add_argument('--port', type=int, default=5059)
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.gettempdir(), f'portal_streaming_{args.employees}.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{path}')
+    import logging
+    logging.disable(logging.WARNING)
+    from jinja2 import ChoiceLoader, DictLoader
+    from werkzeug.serving import make_server
+    from app import app, db
+    from models import Employee
+    from synthetic_org import generate_org
+
+    if not os.path.isdir(os.path.join(app.root_path, app.template_folder)):
+        app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader(STAND_IN_TEMPLATES)])
+
+    with app.app_context():
+        db.create_all()
+        root = Employee.query.filter(Employee.emailid.like('%@synthetic.example'),
+                                     Employee.manager_id.is_(None)).first()
+        if root is None:
+            root = db.session.get(Employee, generate_org(size=args.employees, feedback_years=1,
+                                                         billing_months=1)['root_id'])
+        email = root.emailid
+
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    opener = login(f'http://127.0.0.1:{args.port}', email, 'password123')
+    # Consume the login flash so it is not carried into (and disabling streaming of) the measured requests
+    opener.open(f'http://127.0.0.1:{args.port}/employees').read()
+    cookie = '; '.join(f'{c.name}={c.value}' for handler in opener.handlers
+                       if hasattr(handler, 'cookiejar') for c in handler.cookiejar)
+
+    results = {}
+    try:
+        for page in PAGES:
+            for streamed in (False, True):
+                app.config['STREAM_RENDERING'] = streamed
+                label = 'streamed' if streamed else 'buffered'
+                r = results.setdefault(page, {})[label] = measure(args.port, page, cookie)
+                print(f"{page:11} {label:9} TTFB {r['ttfb_ms']:>9} ms  total {r['total_ms']:>9} ms  "
+                      f"peak {r['peak_mib']:>7} MiB  {r['bytes'] // 1024} KiB")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f'Wrote {args.output}')
+    return results
+
+if __name__ == '__main__':
+    main()
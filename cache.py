@@ -0,0 +1,530 @@
+# cache.py
+import hashlib
+import logging
+import os
+import pickle
+import random
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from flask import g, has_request_context
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: disk cache version bumps are not locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Commits touching these tables invalidate every cached value
+TRACKED_TABLES = frozenset({'employees', 'feedback', 'billing_details', 'feedback_archive', 'billing_details_archive'})
+VERSION_KEY = 'data-version'
+LOCK_POLL_SECONDS = 0.02
+# Redis locks expire on their own in case the holder dies mid-computation
+LOCK_EXPIRY_SECONDS = 60
+
+class NullCache:
+    """Backend that stores nothing; every lookup is a miss"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def counter(self, key):
+        return 0
+
+    @contextmanager
+    def lock(self, key, timeout):
+        """Cross-process lock on `key`; yields False if it could not be taken within `timeout`.
+
+        Process-private backends have nothing to coordinate, so this one
+        always succeeds at once.
+        """
+        yield True
+
+class MemoryCache(NullCache):
+    """Thread-safe LRU with per-entry expiry, private to this process.
+
+    Version bumps are not seen by other workers, so use it with a single
+    worker process (or accept staleness up to the TTL).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}  # kept out of the LRU so the data version is never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+def _check_private_directory(directory):
+    """Refuse a directory other local users could have created or can write to.
+
+    Anyone able to plant a file in it could run code in the app through
+    pickle, e.g. by creating the directory under /tmp before the app does.
+    """
+    for info in (os.lstat(directory), os.stat(directory)):
+        if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            raise ValueError(f'Refusing cache directory {directory}: owned by uid {info.st_uid}, not {os.getuid()}')
+    if info.st_mode & 0o022:
+        raise ValueError(f'Refusing cache directory {directory}: writable by group or others '
+                         f'(mode {oct(info.st_mode & 0o777)}); chmod 700 it')
+
+class DiskCache(NullCache):
+    """One pickle file per key in a directory shared by all workers on the host.
+
+    Point CACHE_DIR at /dev/shm to keep it in shared memory. Writes are
+    atomic renames; expired and surplus entries are pruned now and then.
+    Entries are unpickled, so the directory must be private to this user.
+    """
+
+    def __init__(self, directory, max_entries=10000):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private_directory(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((time.time() + ttl if ttl else None, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if random.random() < 0.01:
+            self.prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def incr(self, key):
+        with open(os.path.join(self.directory, 'version.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                value = (self.get(key) or 0) + 1
+                self.set(key, value, None)
+                return value
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def counter(self, key):
+        return self.get(key) or 0
+
+    @contextmanager
+    def lock(self, key, timeout):
+        if fcntl is None:
+            yield True
+            return
+        with open(self._path(key)[:-len('.cache')] + '.lock', 'a') as f:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        acquired = False
+                        break
+                    time.sleep(LOCK_POLL_SECONDS)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def prune(self):
+        """Drop expired entries, then the oldest ones beyond max_entries"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.lock') and entry.name != 'version.lock':
+                self._remove_idle_lock(entry.path)
+                continue
+            if not entry.name.endswith('.cache'):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    expires_at, _ = pickle.load(f)
+                if expires_at is not None and expires_at < now:
+                    os.remove(entry.path)
+                elif expires_at is not None:
+                    entries.append((entry.stat().st_mtime, entry.path))
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_idle_lock(path):
+        # A process that opened the file just before the unlink may still lock
+        # the orphaned inode; the worst case is one duplicate computation
+        if fcntl is None:
+            return
+        try:
+            with open(path, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(path)
+        except OSError:
+            pass
+
+class RedisCache(NullCache):
+    """Minimal RESP2 client (GET/SET EX/DEL/INCR) for Redis or any protocol-compatible server.
+
+    One connection per thread. Connection errors are logged and treated as
+    misses so an unavailable cache never fails a request.
+    """
+
+    def __init__(self, url, timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock, self._local.reader = sock, sock.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def _call(self, *args):
+        if getattr(self._local, 'sock', None) is None:
+            self._connect()
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self._local.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('connection closed by cache server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload
+        if kind == b'-':
+            raise RuntimeError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._local.reader.read(length + 2)[:-2]
+        raise ConnectionError(f'unexpected reply {line!r}')
+
+    def _safe_call(self, *args):
+        try:
+            return self._call(*args)
+        except (OSError, ConnectionError) as e:
+            logger.warning('Cache server %s:%s unavailable: %s', self.host, self.port, e)
+            sock = getattr(self._local, 'sock', None)
+            if sock is not None:
+                sock.close()
+            self._local.sock = None
+            return None
+
+    def get(self, key):
+        data = self._safe_call('GET', key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if ttl:
+            self._safe_call('SET', key, data, 'EX', int(ttl))
+        else:
+            self._safe_call('SET', key, data)
+
+    def delete(self, key):
+        self._safe_call('DEL', key)
+
+    def incr(self, key):
+        return self._safe_call('INCR', key) or 0
+
+    def counter(self, key):
+        # INCR stores a plain integer, not a pickle
+        return int(self._safe_call('GET', key) or 0)
+
+    @contextmanager
+    def lock(self, key, timeout):
+        # SET NX with an expiry, so a crashed holder cannot block others for long
+        lock_key, token = f'{key}:lock', uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while True:
+            reply = self._safe_call('SET', lock_key, token, 'NX', 'PX', int(LOCK_EXPIRY_SECONDS * 1000))
+            reachable = getattr(self._local, 'sock', None) is not None
+            if reply is not None or not reachable or time.monotonic() >= deadline:
+                break
+            time.sleep(LOCK_POLL_SECONDS)
+        acquired = reply is not None
+        try:
+            # An unreachable server has nobody to coordinate with, so go ahead
+            yield acquired or not reachable
+        finally:
+            if acquired and self._safe_call('GET', lock_key) == token.encode():
+                self._safe_call('DEL', lock_key)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key within this process.
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait for it and get the same result (or exception). A waiter
+    that gives up after `timeout` seconds computes on its own.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+class AppCache:
+    """Versioned cache in front of a backend.
+
+    Keys embed a data version that is bumped whenever a transaction touching
+    employees, feedback or billing commits, so every worker sharing the
+    backend stops seeing older entries at once.
+
+    Concurrent misses for the same key are computed once: threads of this
+    process share one call, and with the disk or redis backend other
+    processes wait on a lock and then read the stored value.
+    """
+
+    def __init__(self, backend=None, prefix='portal', default_ttl=300, lock_timeout=30, single_flight=True):
+        self.backend = backend or NullCache()
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        self.single_flight = single_flight
+        self.flight = SingleFlight(lock_timeout)
+        self._stats_lock = threading.Lock()
+        self.hits = self.misses = self.computations = 0
+
+    def version(self):
+        # Read once per request so a page is built from one consistent version
+        if has_request_context() and '_cache_version' in g:
+            return g._cache_version
+        version = self.backend.counter(f'{self.prefix}:{VERSION_KEY}')
+        if has_request_context():
+            g._cache_version = version
+        return version
+
+    def bump_version(self):
+        version = self.backend.incr(f'{self.prefix}:{VERSION_KEY}')
+        if has_request_context():
+            g.pop('_cache_version', None)
+        return version
+
+    def _key(self, key):
+        return f'{self.prefix}:v{self.version()}:{key}'
+
+    def get(self, key):
+        value = self.backend.get(self._key(key))
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self._key(key), value, ttl if ttl is not None else self.default_ttl)
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Cached value for `key`, computing and storing it on a miss (None is never cached)"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        if not self.single_flight:
+            return self._compute(key, compute, ttl)
+        # The versioned key, so a commit starts a new flight instead of joining a stale one
+        full_key = self._key(key)
+        return self.flight.do(full_key, lambda: self._fill(full_key, key, compute, ttl))
+
+    def _fill(self, full_key, key, compute, ttl):
+        with self.backend.lock(full_key, self.lock_timeout):
+            # Another process may have stored it while we waited for the lock
+            value = self.backend.get(full_key)
+            if value is None:
+                value = self._compute(key, compute, ttl)
+            return value
+
+    def _compute(self, key, compute, ttl):
+        value = compute()
+        with self._stats_lock:
+            self.computations += 1
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def render_metrics(self):
+        """Prometheus text for this worker's hit/miss counters"""
+        with self._stats_lock:
+            hits, misses, computations = self.hits, self.misses, self.computations
+        return ('# HELP portal_cache_requests_total Cache lookups by result.\n'
+                '# TYPE portal_cache_requests_total counter\n'
+                f'portal_cache_requests_total{{result="hit"}} {hits}\n'
+                f'portal_cache_requests_total{{result="miss"}} {misses}\n'
+                '# HELP portal_cache_computations_total Values computed after a miss.\n'
+                '# TYPE portal_cache_computations_total counter\n'
+                f'portal_cache_computations_total {computations}\n'
+                '# HELP portal_cache_coalesced_total Misses that waited for a computation already in flight.\n'
+                '# TYPE portal_cache_coalesced_total counter\n'
+                f'portal_cache_coalesced_total {self.flight.coalesced}\n')
+
+cache = AppCache()
+
+def create_backend(config):
+    """Backend named by CACHE_BACKEND: none, memory, disk or redis"""
+    name = config.get('CACHE_BACKEND', 'none')
+    if name == 'memory':
+        return MemoryCache(config.get('CACHE_MAX_ENTRIES', 1024))
+    if name == 'disk':
+        return DiskCache(config['CACHE_DIR'], config.get('CACHE_MAX_ENTRIES', 1024))
+    if name == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'])
+    if name != 'none':
+        raise ValueError(f'Unknown CACHE_BACKEND {name!r}')
+    return NullCache()
+
+def _touches_tracked_table(statement):
+    table = getattr(statement, 'table', None)
+    return getattr(table, 'name', None) in TRACKED_TABLES
+
+def init_cache(app, db, session_class):
+    """Configure the shared cache and bump its version on relevant commits"""
+    cache.backend = create_backend(app.config)
+    cache.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+    cache.lock_timeout = cache.flight.timeout = app.config.get('CACHE_LOCK_TIMEOUT', 30)
+    cache.single_flight = app.config.get('CACHE_SINGLE_FLIGHT', True)
+    if type(cache.backend) is NullCache:
+        return
+    logger.info('Cache backend: %s', type(cache.backend).__name__)
+
+    @event.listens_for(session_class, 'after_flush')
+    def note_tracked_flush(session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if getattr(getattr(obj, '__table__', None), 'name', None) in TRACKED_TABLES:
+                session.info['cache_stale'] = True
+                return
+
+    @event.listens_for(session_class, 'do_orm_execute')
+    def note_tracked_statement(orm_execute_state):
+        state = orm_execute_state
+        if (state.is_insert or state.is_update or state.is_delete) and _touches_tracked_table(state.statement):
+            state.session.info['cache_stale'] = True
+
+    @event.listens_for(session_class, 'after_commit')
+    def invalidate_cache(session):
+        if session.info.pop('cache_stale', False):
+            cache.bump_version()
+
+    @event.listens_for(session_class, 'after_rollback')
+    def forget_pending_invalidation(session):
+        session.info.pop('cache_stale', None)
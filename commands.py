@@ -0,0 +1,205 @@
+# commands.py
+import click
+from flask import url_for
+from sqlalchemy import func, inspect, update
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+
+def init_database(sample_data=True):
+    """Create missing tables and optionally seed the sample manager"""
+    with app.app_context():
+        db.create_all()
+        if sample_data:
+            from utils import create_sample_data
+            create_sample_data()
+
+def migrate_database():
+    """Create missing tables and any indexes missing from existing tables"""
+    created = []
+    with app.app_context():
+        db.create_all()
+        from models import Employee
+        # Forms used to store a blank System ID as '', which the unique index would reject
+        with db.engine.begin() as connection:
+            connection.execute(update(Employee.__table__).where(func.trim(Employee.system_id) == '').values(system_id=None))
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    try:
+                        index.create(bind=db.engine)
+                    except IntegrityError as e:
+                        raise click.ClickException(
+                            f'Cannot create unique index {index.name}: existing rows in {table.name} '
+                            f'have duplicate values. Resolve them and run migrate-db again.') from e
+                    created.append(index.name)
+        from search import ensure_search_index
+        with db.engine.begin() as connection:
+            ensure_search_index(connection)
+    return created
+
+@app.cli.command('init-db')
+@click.option('--sample-data/--no-sample-data', default=True,
+              help='Seed the default manager account when the database is empty.')
+def init_db_command(sample_data):
+    """Create database tables (and sample data) before first boot."""
+    init_database(sample_data=sample_data)
+    click.echo('Database initialized.')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Recreate the employee full-text index from the current rows."""
+    from search import ensure_search_index
+
+    with app.app_context(), db.engine.begin() as connection:
+        ensure_search_index(connection, rebuild=True)
+    click.echo('Search index rebuilt.')
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Bring an existing database up to date with the models."""
+    created = migrate_database()
+    if created:
+        click.echo(f"Created indexes: {', '.join(created)}")
+    click.echo('Database schema is up to date.')
+
+@app.cli.command('archive-history')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(['feedback', 'billing']),
+              help='Only archive this table (repeatable; defaults to both).')
+@click.option('--batch-size', type=int, help='Rows moved per transaction (defaults to ARCHIVE_BATCH_SIZE).')
+@click.option('--dry-run', is_flag=True, help='Only report how many rows would move.')
+def archive_history_command(tables, batch_size, dry_run):
+    """Move feedback and billing rows older than ARCHIVE_HOT_YEARS into the archive tables."""
+    from archive import archive_history
+
+    with app.app_context():
+        db.create_all()
+        result = archive_history(tables=tables or None, batch_size=batch_size, dry_run=dry_run)
+    verb = 'Would move' if dry_run else 'Moved'
+    for name, counts in result['tables'].items():
+        click.echo(f"{name}: {verb} {counts['archived']} rows before {result['horizon']} "
+                   f"to the archive and {counts['restored']} back.")
+
+def budgeted_routes():
+    """GET routes that declare a query budget, as (url rule, budget)"""
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions.get(rule.endpoint)
+        if 'GET' in rule.methods and hasattr(view, 'query_budget'):
+            yield rule, view.query_budget
+
+def largest_root_manager():
+    """The top-level manager with the most employees below them, or None"""
+    from sqlalchemy import func, select
+    from models import Employee
+
+    roots = Employee.query.filter_by(manager_id=None, is_manager=True).all()
+    return max(roots, default=None, key=lambda root: db.session.scalar(
+        select(func.count()).select_from(root.subordinates_cte())))
+
+def query_budget_args(user_id):
+    """Representative URL values and query arguments for budgeted routes that need them, by rule"""
+    from models import Employee
+
+    with app.app_context():
+        user = db.session.get(Employee, user_id)
+        reports = user.subordinates_query().limit(20).all() if user.is_manager else []
+        sample = reports[0] if reports else user
+        sample_manager = next((e for e in reports if e.is_manager), user)
+    return {
+        '/api/employees/batch': {'ids': ','.join(str(e.id) for e in [user] + reports)},
+        '/api/employees/search': {'q': ((sample.full_name or '').split() or ['a'])[0]},
+        '/api/employee/<int:id>': {'id': sample.id},
+        '/employee/<int:id>': {'id': sample.id},
+        '/api/hierarchy/rollup/<int:id>': {'id': sample_manager.id},
+    }
+
+def check_query_budgets(user_id):
+    """Request every budgeted route as the given user; return (path, budget, error) tuples.
+
+    Each request gets a fresh app context, so the session, identity map and g
+    start empty as they do in production and the user loader and lazy loads
+    are counted. Non-2xx responses count as failures.
+    """
+    from instrumentation import QueryBudgetExceeded, metrics
+
+    previous = app.config['QUERY_GUARD'], app.config.get('TESTING', False)
+    app.config['QUERY_GUARD'] = 'raise'
+    app.config['TESTING'] = True
+    results = []
+    try:
+        args = query_budget_args(user_id)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        for rule, budget in sorted(budgeted_routes(), key=lambda item: item[0].rule):
+            path = rule.rule
+            values = args.get(path, {})
+            if not rule.arguments <= set(values):
+                results.append((path, budget, 'no representative URL arguments to request it with'))
+                continue
+            with app.test_request_context():
+                url = url_for(rule.endpoint, **values)
+            overruns = sum(metrics.budget_overruns.values())
+            try:
+                with app.app_context():
+                    response = client.get(url)
+                    # Streamed pages run their queries (and check their budget) while the body is read
+                    response.get_data()
+                    response.close()
+            except QueryBudgetExceeded as e:
+                results.append((path, budget, str(e)))
+                continue
+            except Exception as e:
+                results.append((path, budget, f'{type(e).__name__}: {e}'))
+                continue
+            if sum(metrics.budget_overruns.values()) > overruns:
+                results.append((path, budget, metrics.last_overrun))
+            elif not 200 <= response.status_code < 300:
+                results.append((path, budget, f'GET {url} returned {response.status_code}'))
+            else:
+                results.append((path, budget, None))
+    finally:
+        app.config['QUERY_GUARD'], app.config['TESTING'] = previous
+    return results
+
+@app.cli.command('check-query-budgets')
+@click.option('--user-id', type=int,
+              help='Employee to request pages as (defaults to the root manager with the largest subtree).')
+def check_query_budgets_command(user_id):
+    """Fail if any budgeted route runs more SQL statements than it declares."""
+    if user_id is None:
+        with app.app_context():
+            root = largest_root_manager()
+            if root is None:
+                raise click.ClickException('No root manager found; seed the database first.')
+            user_id = root.id
+
+    failures = 0
+    for path, budget, error in check_query_budgets(user_id):
+        if error:
+            failures += 1
+            click.echo(f'FAIL {path}: {error}')
+        else:
+            click.echo(f'ok   {path} (budget {budget})')
+    if failures:
+        raise click.ClickException(f'{failures} budgeted route(s) failed the check.')
+
+@app.cli.command('seed-org')
+@click.option('--employees', 'size', default=10000, show_default=True, help='Number of employees to create.')
+@click.option('--depth', default=6, show_default=True, help='Management levels below the root.')
+@click.option('--feedback-years', default=2, show_default=True, help='Years of quarterly feedback history.')
+@click.option('--billing-months', default=12, show_default=True, help='Months of billing history.')
+@click.option('--seed', default=42, show_default=True, help='Random seed for reproducible orgs.')
+def seed_org_command(size, depth, feedback_years, billing_months, seed):
+    """Bulk-load a synthetic organization for load and query-budget testing."""
+    from synthetic_org import generate_org
+
+    with app.app_context():
+        db.create_all()
+        summary = generate_org(size=size, depth=depth, feedback_years=feedback_years,
+                               billing_months=billing_months, seed=seed)
+    click.echo(f"Created {summary['employees']} employees ({summary['managers']} managers), "
+               f"{summary['feedback']} feedback and {summary['billing']} billing records; "
+               f"root employee id {summary['root_id']}.")
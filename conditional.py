@@ -0,0 +1,69 @@
+# conditional.py
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func, select, union
+from app import db
+from models import Employee
+
+def scope_fingerprint(*conditions):
+    """(row count, newest updated_at) over the employees matching `conditions`.
+
+    One aggregate query. Edits bump updated_at, and deletions change the count,
+    which is enough to tell whether anything derived from the scope changed.
+    """
+    return db.session.execute(
+        select(func.count(Employee.id), func.max(Employee.updated_at)).where(*conditions)
+    ).one()
+
+def own_scope_fingerprint(include_self=True):
+    """Fingerprint of the current user's subtree (and, by default, the user themselves)"""
+    ids = select(current_user.subordinates_cte().c.id)
+    if include_self:
+        ids = union(ids, select(Employee.id).where(Employee.id == current_user.id))
+    return scope_fingerprint(Employee.id.in_(select(ids.subquery())))
+
+def _make_etag(parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+def conditional(fingerprint):
+    """Serve 304 Not Modified when the client's ETag matches `fingerprint()`.
+
+    `fingerprint(*view_args)` returns (count, last_updated) for the data the
+    view depends on, or None to skip validation (e.g. when the view is going
+    to redirect or deny access). It runs before the view, so a matching
+    If-None-Match skips the heavy queries and rendering entirely. ETags are
+    per user and per endpoint, and pages with pending flash messages are
+    always rendered.
+
+    Last-Modified is sent for information only: a deletion does not move
+    max(updated_at), so If-Modified-Since alone is never answered with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            validators = None if session.get('_flashes') else fingerprint(*args, **kwargs)
+            if validators is None:
+                return view(*args, **kwargs)
+            count, last_updated = validators
+            last_modified = max(filter(None, (last_updated, current_user.updated_at)), default=None)
+            etag = _make_etag((request.endpoint, request.full_path, current_user.id,
+                               current_user.updated_at, count, last_updated))
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            # Per-user content: browsers may keep it but must revalidate every time
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
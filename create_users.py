@@ -5,6 +5,8 @@ from models import Employee
 
 def create_sample_users():
     with app.app_context():
+        db.create_all()
+
         # Check if users already exist
         if Employee.query.first():
             print("Users already exist in database")
@@ -12,43 +14,44 @@ def create_sample_users():
         
         # Create top-level manager
         top_manager = Employee(
-            employee_id='EMP001',
-            name='Sooraj Kumar',
-            email='sooraj@company.com',
+            system_id='EMP001',
+            full_name='Sooraj Kumar',
+            emailid='sooraj@company.com',
             designation='VP Engineering',
-            department='Engineering',
             location='Bangalore',
             team='UFS',
             employment_type='Permanent',
             billable_status='Non-billable',
             is_manager=True,
-            manager_id=None
+            manager_id=None,
+            role='VP',
+            employee_status='Active'
         )
         top_manager.set_password('password123')
         db.session.add(top_manager)
         db.session.commit()
-        print(f"Created top manager: {top_manager.name}")
+        print(f"Created top manager: {top_manager.full_name}")
         
         # Create line managers
         managers_data = [
             {
-                'employee_id': 'EMP002',
-                'name': 'Anuja Sharma',
-                'email': 'anuja@company.com',
+                'system_id': 'EMP002',
+                'full_name': 'Anuja Sharma',
+                'emailid': 'anuja@company.com',
                 'designation': 'Engineering Manager',
                 'team': 'UFS'
             },
             {
-                'employee_id': 'EMP003',
-                'name': 'Asha Patel',
-                'email': 'asha@company.com',
+                'system_id': 'EMP003',
+                'full_name': 'Asha Patel',
+                'emailid': 'asha@company.com',
                 'designation': 'Tech Lead',
                 'team': 'RG'
             },
             {
-                'employee_id': 'EMP004',
-                'name': 'Vinod Singh',
-                'email': 'vinod@company.com',
+                'system_id': 'EMP004',
+                'full_name': 'Vinod Singh',
+                'emailid': 'vinod@company.com',
                 'designation': 'Senior Manager',
                 'team': 'UFS'
             }
@@ -56,21 +59,22 @@ def create_sample_users():
         
         for mgr_data in managers_data:
             manager = Employee(
-                employee_id=mgr_data['employee_id'],
-                name=mgr_data['name'],
-                email=mgr_data['email'],
+                system_id=mgr_data['system_id'],
+                full_name=mgr_data['full_name'],
+                emailid=mgr_data['emailid'],
                 designation=mgr_data['designation'],
-                department='Engineering',
                 location='Bangalore',
                 team=mgr_data['team'],
                 employment_type='Permanent',
                 billable_status='Billable',
                 is_manager=True,
-                manager_id=top_manager.id
+                manager_id=top_manager.id,
+                manager_name=top_manager.full_name,
+                employee_status='Active'
             )
             manager.set_password('password123')
             db.session.add(manager)
-            print(f"Created manager: {manager.name}")
+            print(f"Created manager: {manager.full_name}")
         
         db.session.commit()
         print("Sample users created successfully!")
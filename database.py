@@ -0,0 +1,227 @@
+# database.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from flask import has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from instrumentation import Histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to SQLite's own locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Checkout waits are usually sub-millisecond; the tail is what matters for sizing
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+def _env_flag(value):
+    return value.lower() in ("1", "true", "yes")
+
+def engine_options_from_env(url, prefix="DATABASE"):
+    """Engine options for `url` from PREFIX_* variables, falling back to DATABASE_*.
+
+    Covers pool sizing (POOL_SIZE, MAX_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE,
+    POOL_PRE_PING), the compiled statement cache (COMPILED_CACHE_SIZE) and
+    psycopg2 batching (EXECUTEMANY_MODE, EXECUTEMANY_PAGE_SIZE).
+    """
+    def setting(name, default=None):
+        return os.environ.get(f"{prefix}_{name}", os.environ.get(f"DATABASE_{name}", default))
+
+    options = {
+        "pool_recycle": int(setting("POOL_RECYCLE", "300")),
+        # Pre-ping costs a round trip per checkout; disable it when recycle is tuned below server timeouts
+        "pool_pre_ping": _env_flag(setting("POOL_PRE_PING", "true")),
+        "query_cache_size": int(setting("COMPILED_CACHE_SIZE", "500")),
+        "connect_args": {"sslmode": "prefer"} if url.startswith("postgresql") else {},
+    }
+    in_memory = url.startswith("sqlite") and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+    if not in_memory:
+        options["poolclass"] = InstrumentedQueuePool
+        for name, key in (("POOL_SIZE", "pool_size"), ("MAX_OVERFLOW", "max_overflow")):
+            if setting(name):
+                options[key] = int(setting(name))
+        if setting("POOL_TIMEOUT"):
+            options["pool_timeout"] = float(setting("POOL_TIMEOUT"))
+    if url.startswith("postgresql+psycopg2"):
+        if setting("EXECUTEMANY_MODE"):
+            options["executemany_mode"] = setting("EXECUTEMANY_MODE")  # values_only / values_plus_batch
+        if setting("EXECUTEMANY_PAGE_SIZE"):
+            options["insertmanyvalues_page_size"] = int(setting("EXECUTEMANY_PAGE_SIZE"))
+    return options
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkout_wait = Histogram(POOL_WAIT_BUCKETS)
+        self.checkout_timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self.stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        with self.stats_lock:
+            self.checkout_wait.observe(time.perf_counter() - started)
+        return connection
+
+# SQLAlchemy names pool loggers after their class, which puts this one outside the "sqlalchemy"
+# hierarchy and its WARN default; without this, dispose/recreate (and with LOG_LEVEL=DEBUG every
+# checkout) would be logged. echo_pool or an explicit level for this logger still apply.
+_pool_logger = logging.getLogger(f'{InstrumentedQueuePool.__module__}.{InstrumentedQueuePool.__name__}')
+if _pool_logger.level == logging.NOTSET:
+    _pool_logger.setLevel(logging.WARNING)
+
+def render_pool_metrics(engines):
+    """Prometheus text for the connection pools of the given {bind_key: engine} map"""
+    pools = [(key or 'primary', engine.pool) for key, engine in sorted(engines.items(), key=lambda kv: kv[0] or '')
+             if isinstance(engine.pool, InstrumentedQueuePool)]
+    lines = ['# HELP portal_db_pool_checkout_wait_seconds Time spent waiting for a pooled connection.',
+             '# TYPE portal_db_pool_checkout_wait_seconds histogram']
+    for name, pool in pools:
+        with pool.stats_lock:
+            hist = pool.checkout_wait
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f'portal_db_pool_checkout_wait_seconds_bucket{{engine="{name}",le="{bound}"}} {count}')
+            lines.append(f'portal_db_pool_checkout_wait_seconds_bucket{{engine="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'portal_db_pool_checkout_wait_seconds_sum{{engine="{name}"}} {hist.sum:.6f}')
+            lines.append(f'portal_db_pool_checkout_wait_seconds_count{{engine="{name}"}} {hist.count}')
+    for metric, kind, help_text, value in (
+        ('portal_db_pool_checkout_timeouts_total', 'counter', 'Checkouts that hit pool_timeout.',
+         lambda pool: pool.checkout_timeouts),
+        ('portal_db_pool_size', 'gauge', 'Configured pool size.', lambda pool: pool.size()),
+        ('portal_db_pool_checked_out', 'gauge', 'Connections currently checked out.', lambda pool: pool.checkedout()),
+        ('portal_db_pool_overflow', 'gauge', 'Connections open beyond pool_size (negative while filling).',
+         lambda pool: pool.overflow()),
+    ):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for name, pool in pools:
+            lines.append(f'{metric}{{engine="{name}"}} {value(pool)}')
+    return '\n'.join(lines) + '\n'
+
+def sqlite_pragmas_from_env():
+    """Connect-time PRAGMAs for SQLite, overridable through SQLITE_* variables"""
+    return {
+        'journal_mode': os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        'synchronous': os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        'mmap_size': int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        'cache_size': int(os.environ.get("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, so 64 MiB
+        'busy_timeout': int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")),  # milliseconds
+        'temp_store': os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    }
+
+def configure_sqlite(pragmas):
+    """Apply PRAGMAs to every new SQLite connection and take over transaction begins.
+
+    pysqlite normally issues BEGIN lazily on the first write, which means a
+    transaction that has already read cannot be upgraded to a writer without
+    risking "database is locked". Disabling that behaviour and emitting BEGIN
+    ourselves lets long jobs ask for BEGIN IMMEDIATE (see serialized_writes).
+    """
+    @event.listens_for(Engine, 'connect')
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        dbapi_connection.isolation_level = None
+        connection_record.info['sqlite_explicit_begin'] = True
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    @event.listens_for(Engine, 'begin')
+    def begin_sqlite_transaction(conn):
+        if conn.connection.info.get('sqlite_explicit_begin'):
+            mode = conn.get_execution_options().get('sqlite_begin', 'DEFERRED')
+            conn.exec_driver_sql(f'BEGIN {mode}')
+
+@contextmanager
+def serialized_writes(db):
+    """Run a long write job as the single SQLite writer.
+
+    Holds an exclusive file lock so imports from different workers queue up
+    instead of timing out, and starts the session's transaction with BEGIN
+    IMMEDIATE so the write lock is taken up front. In WAL mode readers carry
+    on unblocked. Any transaction already open on the session is committed
+    first. A no-op on other databases.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite' or not engine.url.database or engine.url.database == ':memory:':
+        yield
+        return
+
+    lock_file = open(engine.url.database + '.write-lock', 'a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        db.session.commit()
+        db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+# Bind key of the optional read-replica engine (see DATABASE_READ_URL)
+READ_BIND = 'read'
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica engine when the request allows it.
+
+    Routing is opt-in per request (``info['use_replica']``, set for views marked
+    with @read_only). Anything inside a flush, any DML, and every statement after
+    the session has written goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('use_replica') and not self.info.get('wrote') \
+                and not self._flushing and not getattr(clause, 'is_dml', False):
+            replica = self._db.engines.get(READ_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_only(view):
+    """Mark a view as safe to serve from the read replica"""
+    view.read_only = True
+    return view
+
+def init_read_routing(app, db):
+    """Route @read_only GET requests to the replica, with read-your-writes stickiness"""
+    if READ_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    sticky_seconds = app.config.get('READ_AFTER_WRITE_SECONDS', 5)
+
+    @app.before_request
+    def choose_database_engine():
+        view = app.view_functions.get(request.endpoint)
+        if request.method not in ('GET', 'HEAD') or not getattr(view, 'read_only', False):
+            return
+        # A browser session that just wrote keeps reading from the primary until
+        # the replica has had time to catch up
+        if flask_session.get('_primary_until', 0) > time.time():
+            return
+        db.session.info['use_replica'] = True
+
+    @event.listens_for(RoutingSession, 'after_flush')
+    def mark_session_wrote(session, flush_context):
+        session.info['wrote'] = True
+
+    @event.listens_for(RoutingSession, 'after_commit')
+    def stick_to_primary(session):
+        if session.info.get('wrote') and has_request_context():
+            flask_session['_primary_until'] = time.time() + sticky_seconds
@@ -0,0 +1,57 @@
+# gunicorn.conf.py
+"""Production serving profile: gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment (or on the command line).
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# One process per core for rendering and analytics (CPU-bound under the GIL), with a few
+# threads each to overlap database and cache round trips
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Import the app once in the master and fork it. app.py disposes the inherited database
+# connections in every child (os.register_at_fork), so workers never share a socket.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Excel imports of up to MAX_CONTENT_LENGTH (16 MB) upload and parse within one request
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+# Long enough to reuse a browser's connection across a page and its API calls
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then (pandas imports leave fragmented heaps); preloaded and
+# prewarmed state is simply inherited again from the master
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+# Heartbeat files on tmpfs so a slow disk cannot make healthy workers look hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+def when_ready(server):
+    """Prewarm once in the master, before the first worker is forked"""
+    if server.cfg.preload_app:
+        _prewarm()
+        # The master serves nothing; close the connections prewarming opened
+        from app import app, db
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+def post_worker_init(worker):
+    """Without preloading, each worker prewarms itself before accepting connections"""
+    if not worker.cfg.preload_app:
+        _prewarm()
+
+def _prewarm():
+    from wsgi import prewarm
+    prewarm()
@@ -0,0 +1,235 @@
+# instrumentation.py
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense (buckets, sum, count)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class RequestMetrics:
+    """Per-endpoint aggregates for the current worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.sql_count = {}
+        self.sql_time = {}
+        self.rows_loaded = {}
+        self.requests = {}
+        self.budget_overruns = {}
+        self.last_overrun = None
+
+    def record(self, endpoint, method, status, duration, sql_count, sql_time, rows):
+        with self._lock:
+            if endpoint not in self.latency:
+                self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+                self.sql_count[endpoint] = Histogram(QUERY_COUNT_BUCKETS)
+                self.sql_time[endpoint] = Histogram(LATENCY_BUCKETS)
+                self.rows_loaded[endpoint] = 0
+            self.latency[endpoint].observe(duration)
+            self.sql_count[endpoint].observe(sql_count)
+            self.sql_time[endpoint].observe(sql_time)
+            self.rows_loaded[endpoint] += rows
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def record_overrun(self, endpoint, message):
+        with self._lock:
+            self.budget_overruns[endpoint] = self.budget_overruns.get(endpoint, 0) + 1
+            self.last_overrun = message
+
+    def reset(self):
+        with self._lock:
+            self.__init__()
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, 'portal_request_duration_seconds',
+                                    'Wall time spent handling a request.', self.latency)
+            self._render_histograms(lines, 'portal_sql_statements',
+                                    'SQL statements executed per request.', self.sql_count)
+            self._render_histograms(lines, 'portal_sql_duration_seconds',
+                                    'Total SQL time per request.', self.sql_time)
+
+            lines.append('# HELP portal_rows_loaded_total ORM rows loaded while handling requests.')
+            lines.append('# TYPE portal_rows_loaded_total counter')
+            for endpoint, rows in sorted(self.rows_loaded.items()):
+                lines.append(f'portal_rows_loaded_total{{endpoint="{endpoint}"}} {rows}')
+
+            lines.append('# HELP portal_requests_total Requests handled, by endpoint, method and status.')
+            lines.append('# TYPE portal_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'portal_requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            lines.append('# HELP portal_query_budget_overruns_total Requests that ran more SQL statements than their budget.')
+            lines.append('# TYPE portal_query_budget_overruns_total counter')
+            for endpoint, count in sorted(self.budget_overruns.items()):
+                lines.append(f'portal_query_budget_overruns_total{{endpoint="{endpoint}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for endpoint, hist in sorted(histograms.items()):
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist.count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {hist.sum:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {hist.count}')
+
+metrics = RequestMetrics()
+
+class QueryBudgetExceeded(Exception):
+    """Raised in QUERY_GUARD=raise mode when a view runs too many statements"""
+
+def query_budget(max_statements, streamed=None):
+    """Declare the maximum number of SQL statements a view may execute.
+
+    `streamed` is the budget when the page is streamed instead, where a
+    RowStream's len() costs a COUNT query of its own.
+    """
+    def decorator(view):
+        view.query_budget = max_statements
+        if streamed is not None:
+            view.query_budget_streamed = streamed
+        return view
+    return decorator
+
+_PLACEHOLDER_RUN = re.compile(r"(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+")
+
+def statement_shape(statement):
+    """Collapse whitespace and IN-list placeholders so identical queries compare equal"""
+    return _PLACEHOLDER_RUN.sub('?...', ' '.join(statement.split()))
+
+def _request_stats():
+    """Return the stats dict for the active request, if any"""
+    if has_app_context():
+        return g.get('_perf_stats')
+    return None
+
+# The start time lives on the execution context, which is discarded with a failed statement;
+# on the pooled connection's info a failure would leave it behind to pair with later statements
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_start', None)
+    stats = _request_stats()
+    if stats is not None:
+        stats['sql_count'] += 1
+        if started is not None:
+            stats['sql_time'] += time.perf_counter() - started
+        if 'shapes' in stats:
+            stats['shapes'][statement_shape(statement)] += 1
+
+def _on_load(target, context):
+    stats = _request_stats()
+    if stats is not None:
+        stats['rows'] += 1
+
+def init_instrumentation(app, db):
+    """Attach request timing and SQL accounting hooks to the application"""
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(db.Model, 'load', _on_load, propagate=True)
+
+    slow_request_ms = app.config.get('SLOW_REQUEST_MS', 1000)
+
+    @app.before_request
+    def start_request_timer():
+        g._perf_stats = {'start': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0, 'rows': 0}
+        if current_app.config.get('QUERY_GUARD', 'off') != 'off':
+            g._perf_stats['shapes'] = Counter()
+
+    def finish_request(stats, endpoint, method, path, status, may_raise=True):
+        duration = time.perf_counter() - stats['start']
+        metrics.record(endpoint, method, status, duration,
+                       stats['sql_count'], stats['sql_time'], stats['rows'])
+
+        if duration * 1000 >= slow_request_ms:
+            logger.warning('Slow request %s %s: %.1f ms, %d queries (%.1f ms SQL), %d rows',
+                           method, path, duration * 1000, stats['sql_count'],
+                           stats['sql_time'] * 1000, stats['rows'])
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s %s: %.1f ms, %d queries (%.1f ms SQL), %d rows',
+                         method, path, duration * 1000, stats['sql_count'],
+                         stats['sql_time'] * 1000, stats['rows'])
+
+        if 'shapes' in stats:
+            check_query_budget(endpoint, stats, may_raise)
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = g.get('_perf_stats')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        if response.is_streamed:
+            # A streamed body (and the queries behind it) is produced after this
+            # hook; the stats stay in g so they keep counting until it is closed
+            method, path, status = request.method, request.path, response.status_code
+            stats['streamed'] = True
+
+            def finish_streamed():
+                with app.app_context():
+                    finish_request(stats, endpoint, method, path, status, may_raise=False)
+            response.call_on_close(finish_streamed)
+            return response
+        g.pop('_perf_stats')
+        finish_request(stats, endpoint, request.method, request.path, response.status_code)
+        return response
+
+def check_query_budget(endpoint, stats, may_raise=True):
+    """Flag repeated statement shapes and enforce the view's declared budget"""
+    config = current_app.config
+    threshold = config.get('QUERY_GUARD_REPEAT_THRESHOLD', 3)
+    repeated = [(shape, count) for shape, count in stats['shapes'].most_common() if count >= threshold]
+    for shape, count in repeated:
+        logger.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, count, shape[:200])
+
+    view = current_app.view_functions.get(endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if stats.get('streamed'):
+        budget = getattr(view, 'query_budget_streamed', budget)
+    if budget is None or stats['sql_count'] <= budget:
+        return
+
+    message = f"{endpoint} executed {stats['sql_count']} SQL statements (budget {budget})"
+    if stats.get('streamed'):
+        message += ' while streaming'
+    if repeated:
+        message += '; repeated: ' + '; '.join(f'{count}x {shape[:120]}' for shape, count in repeated)
+    # Streamed overruns cannot be raised (the response has been sent); they are counted here instead
+    metrics.record_overrun(endpoint, message)
+    if config.get('QUERY_GUARD') == 'raise' and may_raise:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
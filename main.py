@@ -1,4 +1,7 @@
 from app import app
+from commands import init_database
 
 if __name__ == '__main__':
+    # The dev server bootstraps its own schema; production runs `flask --app app init-db`
+    init_database()
     app.run(host='0.0.0.0', port=5000, debug=True)
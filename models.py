@@ -1,5 +1,6 @@
 from app import db
 from flask_login import UserMixin
+from sqlalchemy import false, select, true, union_all
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -12,14 +13,14 @@ class Employee(UserMixin, db.Model):
     employment_type = db.Column(db.String(50))
     billable_status = db.Column(db.String(50))
     employee_status = db.Column(db.String(50))
-    system_id = db.Column(db.String(50))
+    system_id = db.Column(db.String(50), unique=True, index=True)
     bensl_id = db.Column(db.String(50))
     full_name = db.Column(db.String(200))
     role = db.Column(db.String(100))
     skill = db.Column(db.Text)
     team = db.Column(db.String(100))
     manager_name = db.Column(db.String(200))
-    manager_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True)
+    manager_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True, index=True)
     critical = db.Column(db.String(20))
     
     # Date Information
@@ -59,21 +60,36 @@ class Employee(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    def subordinates_cte(self):
+        """Recursive CTE of the ids of everyone below this employee"""
+        tree = select(Employee.id).where(Employee.manager_id == self.id).cte('subordinates', recursive=True)
+        # UNION (not UNION ALL) so a manager_id cycle terminates instead of recursing forever
+        return tree.union(select(Employee.id).where(Employee.manager_id == tree.c.id))
+    
+    def subordinates_query(self):
+        """Query for all employees under this manager's hierarchy, in one statement"""
+        tree = self.subordinates_cte()
+        return Employee.query.join(tree, Employee.id == tree.c.id).order_by(Employee.full_name)
+    
     def get_all_subordinates(self):
         """Get all employees under this manager's hierarchy"""
-        subordinates = []
-        direct_reports = self.direct_reports
-        for report in direct_reports:
-            subordinates.append(report)
-            subordinates.extend(report.get_all_subordinates())
-        return subordinates
+        return self.subordinates_query().all()
     
     def can_manage(self, employee):
         """Check if this employee can manage another employee"""
-        if not self.is_manager:
+        if not self.is_manager or employee is None:
             return False
-        subordinates = self.get_all_subordinates()
-        return employee in subordinates
+        tree = self.subordinates_cte()
+        return db.session.query(select(tree.c.id).where(tree.c.id == employee.id).exists()).scalar()
+    
+    # Columns exposed through the JSON APIs (everything except credentials and timestamps)
+    API_FIELDS = (
+        'id', 'employment_type', 'billable_status', 'employee_status', 'system_id', 'bensl_id',
+        'full_name', 'role', 'skill', 'team', 'manager_name', 'manager_id', 'critical',
+        'doj_allianz', 'dol_allianz', 'doj_project', 'dol_project', 'grade', 'designation',
+        'gender', 'company', 'emailid', 'location', 'billing_rate', 'rate_card', 'remarks',
+        'is_manager'
+    )
     
     def to_dict(self):
         return {
@@ -106,16 +122,16 @@ class Employee(UserMixin, db.Model):
             'is_manager': self.is_manager
         }
 
-class Feedback(db.Model):
-    __tablename__ = 'feedback'
+class FeedbackColumns:
+    """Columns shared by feedback, its archive and the combined history"""
     
     id = db.Column(db.Integer, primary_key=True)
-    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False, index=True)
     manager_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
     
     # Feedback Period
     feedback_type = db.Column(db.String(20), nullable=False)  # Monthly/Quarterly
-    period_year = db.Column(db.Integer, nullable=False)
+    period_year = db.Column(db.Integer, nullable=False, index=True)
     period_month = db.Column(db.Integer)  # For monthly feedback
     period_quarter = db.Column(db.Integer)  # For quarterly feedback
     
@@ -147,8 +163,13 @@ class Feedback(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
-class BillingDetail(db.Model):
-    __tablename__ = 'billing_details'
+class Feedback(FeedbackColumns, db.Model):
+    __tablename__ = 'feedback'
+    # Never reuse ids on SQLite: archived rows keep theirs and may be restored
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class BillingColumns:
+    """Columns shared by billing_details, its archive and the combined history"""
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -161,7 +182,7 @@ class BillingDetail(db.Model):
     
     # Time Period
     billing_month = db.Column(db.Integer, nullable=False)
-    billing_year = db.Column(db.Integer, nullable=False)
+    billing_year = db.Column(db.Integer, nullable=False, index=True)
     
     # Hours and Amount
     billable_hours = db.Column(db.Float, default=0.0)
@@ -188,3 +209,47 @@ class BillingDetail(db.Model):
             'total_amount': self.total_amount,
             'billing_status': self.billing_status
         }
+
+class BillingDetail(BillingColumns, db.Model):
+    __tablename__ = 'billing_details'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Rows older than the archive horizon, moved out of the hot tables by archive.py
+class FeedbackArchive(FeedbackColumns, db.Model):
+    __tablename__ = 'feedback_archive'
+    
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BillingDetailArchive(BillingColumns, db.Model):
+    __tablename__ = 'billing_details_archive'
+    
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _history(name, hot, archive):
+    """UNION ALL of a hot table and its archive, with an `archived` flag"""
+    columns = [column.name for column in hot.__table__.columns]
+    return union_all(
+        select(*[hot.__table__.c[name] for name in columns], false().label('archived')),
+        select(*[archive.__table__.c[name] for name in columns], true().label('archived')),
+    ).subquery(name)
+
+# Read-only views over current and archived rows, for pages and reports that need full history
+class FeedbackHistory(db.Model):
+    __table__ = _history('feedback_history', Feedback, FeedbackArchive)
+    __mapper_args__ = {'primary_key': [__table__.c.id, __table__.c.archived]}
+    
+    received_by = db.relationship('Employee', primaryjoin='foreign(FeedbackHistory.employee_id) == Employee.id',
+                                  viewonly=True)
+    given_by = db.relationship('Employee', primaryjoin='foreign(FeedbackHistory.manager_id) == Employee.id',
+                               viewonly=True)
+    
+    to_dict = FeedbackColumns.to_dict
+
+class BillingHistory(db.Model):
+    __table__ = _history('billing_details_history', BillingDetail, BillingDetailArchive)
+    __mapper_args__ = {'primary_key': [__table__.c.id, __table__.c.archived]}
+    
+    employee = db.relationship('Employee', primaryjoin='foreign(BillingHistory.employee_id) == Employee.id',
+                               viewonly=True)
+    
+    to_dict = BillingColumns.to_dict
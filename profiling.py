@@ -0,0 +1,143 @@
+# profiling.py
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+from flask import current_app, request
+
+logger = logging.getLogger(__name__)
+
+_FILENAME = re.compile(r'^(?P<stamp>\d+)-(?P<endpoint>[\w.]+)-(?P<duration>\d+)ms\.prof$')
+# Since Python 3.12 cProfile uses sys.monitoring, which allows one active profiler per process
+_profiler_lock = threading.Lock()
+
+def _should_profile(config):
+    # The header only counts with a configured token; otherwise anyone could force profiles onto disk
+    token = config.get('PROFILE_TOKEN')
+    header = request.headers.get(config['PROFILE_HEADER'])
+    if token and header and hmac.compare_digest(header.encode(), token.encode()):
+        return True
+    rate = config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def _profiled(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        if not _should_profile(config):
+            return view(*args, **kwargs)
+        if not _profiler_lock.acquire(blocking=False):
+            # Another thread is being profiled; serve this request unprofiled
+            return view(*args, **kwargs)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(view, *args, **kwargs)
+        finally:
+            _profiler_lock.release()
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                save_profile(profiler, request.endpoint or 'unknown', duration_ms, config)
+            except OSError as e:
+                logger.warning('Could not write profile for %s: %s', request.endpoint, e)
+    return wrapper
+
+def init_profiling(app):
+    """Wrap every registered view in the sampling profiler.
+
+    Must run after the routes are registered. When PROFILING_ENABLED is off the
+    views are left untouched, so the hook costs nothing.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint != 'static':
+            app.view_functions[endpoint] = _profiled(view)
+    logger.info('Request profiling enabled (sample rate %s, header %s)',
+                app.config['PROFILE_SAMPLE_RATE'], app.config['PROFILE_HEADER'])
+
+def save_profile(profiler, endpoint, duration_ms, config):
+    """Write a .prof dump (and optionally folded stacks) and prune old dumps"""
+    directory = config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f'{int(time.time() * 1000)}-{endpoint}-{int(duration_ms)}ms')
+    profiler.dump_stats(base + '.prof')
+    if config.get('PROFILE_COLLAPSED'):
+        with open(base + '.collapsed', 'w') as f:
+            for stack, weight in collapsed_stacks(pstats.Stats(profiler)).items():
+                f.write(f'{stack} {weight}\n')
+    prune_profiles(directory, config['PROFILE_KEEP'])
+
+def _label(func):
+    filename, line, name = func
+    return f'{os.path.basename(filename)}:{line}({name})'.replace(';', ',').replace(' ', '_')
+
+def collapsed_stacks(stats, max_depth=64):
+    """Approximate folded stacks (flamegraph.pl / speedscope input) from a cProfile caller graph.
+
+    cProfile only records caller->callee edges, so time for a function is split
+    across the paths that reach it in proportion to each edge's cumulative time.
+    Weights are microseconds of self time.
+    """
+    entries = stats.stats
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+    folded = Counter()
+
+    def walk(func, path, share):
+        _, _, self_time, total_time, _ = entries[func]
+        path = path + (_label(func),)
+        weight = int(self_time * share * 1_000_000)
+        if weight:
+            folded[';'.join(path)] += weight
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, {}).items():
+            callee_total = entries[callee][3]
+            if callee_total <= 0 or _label(callee) in path:
+                continue
+            walk(callee, path, share * edge_time / callee_total)
+
+    for func, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            walk(func, (), 1.0)
+    return folded
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles (and their folded stacks)"""
+    dumps = sorted(name for name in os.listdir(directory) if _FILENAME.match(name))
+    for name in (dumps[:-keep] if keep else []):
+        base = os.path.join(directory, name[:-len('.prof')])
+        for path in (base + '.prof', base + '.collapsed'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles(directory, per_endpoint=10):
+    """Most recent profiles grouped by endpoint, newest first"""
+    if not os.path.isdir(directory):
+        return {}
+    grouped = defaultdict(list)
+    for name in sorted(os.listdir(directory), reverse=True):
+        match = _FILENAME.match(name)
+        if not match:
+            continue
+        profiles = grouped[match['endpoint']]
+        if len(profiles) < per_endpoint:
+            collapsed = name[:-len('.prof')] + '.collapsed'
+            profiles.append({
+                'file': name,
+                'collapsed': collapsed if os.path.exists(os.path.join(directory, collapsed)) else None,
+                'duration_ms': int(match['duration']),
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                             time.localtime(int(match['stamp']) / 1000)),
+            })
+    return dict(grouped)
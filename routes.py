@@ -1,12 +1,23 @@
 import os
 import json
 from datetime import datetime, date
-from flask import render_template, redirect, url_for, flash, request, jsonify, send_file
+from flask import render_template, redirect, url_for, flash, request, jsonify, send_file, send_from_directory, abort, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from app import app, db
-from models import Employee, Feedback, BillingDetail
-from utils import process_excel_file, get_dashboard_analytics, allowed_file
+from models import Employee, Feedback, BillingDetail, FeedbackHistory, BillingHistory
+from utils import process_excel_file, get_scope_analytics, get_feedback_analytics, create_bulk_feedback, allowed_file, \
+    offboard_employees, move_employees, compute_subtree_rollups, ROLLUP_COLUMNS, FEEDBACK_GRANULARITIES, FEEDBACK_TEXT_FIELDS, IMPORT_MODES, OFFBOARD_FILTERS
+from instrumentation import metrics, query_budget
+from profiling import list_profiles
+from database import read_only, render_pool_metrics
+from conditional import conditional, scope_fingerprint, own_scope_fingerprint
+from search import search_employees, MAX_PER_PAGE
+from streaming import render_page, rows
+from cache import cache
 
 @app.route('/')
 def index():
@@ -41,20 +52,17 @@ def logout():
 
 @app.route('/dashboard')
 @login_required
+@read_only
+@query_budget(5)
 def dashboard():
     # Get analytics data for current user's scope
-    if current_user.is_manager:
-        subordinates = current_user.get_all_subordinates()
-        employees_in_scope = subordinates + [current_user]
-    else:
-        employees_in_scope = [current_user]
-    
-    analytics = get_dashboard_analytics(employees_in_scope)
+    analytics = get_scope_analytics(current_user)
     
     # Get recent feedback
     recent_feedback = []
     if current_user.is_manager:
         recent_feedback = Feedback.query.filter_by(manager_id=current_user.id)\
+                                      .options(joinedload(Feedback.received_by))\
                                       .order_by(Feedback.created_at.desc())\
                                       .limit(5).all()
     
@@ -64,15 +72,18 @@ def dashboard():
 
 @app.route('/employees')
 @login_required
+@read_only
+@query_budget(4, streamed=5)
+@conditional(lambda: own_scope_fingerprint() if current_user.is_manager else None)
 def employees():
     if not current_user.is_manager:
         flash('Access denied. Only managers can view employee lists.', 'error')
         return redirect(url_for('dashboard'))
     
     # Get employees under current manager
-    subordinates = current_user.get_all_subordinates()
+    subordinates = rows(current_user.subordinates_query().options(joinedload(Employee.manager)))
     
-    return render_template('employees.html', employees=subordinates)
+    return render_page('employees.html', employees=subordinates)
 
 @app.route('/employee/add', methods=['GET', 'POST'])
 @login_required
@@ -87,7 +98,7 @@ def add_employee():
                 employment_type=request.form.get('employment_type'),
                 billable_status=request.form.get('billable_status'),
                 employee_status=request.form.get('employee_status'),
-                system_id=request.form.get('system_id'),
+                system_id=request.form.get('system_id', '').strip() or None,
                 bensl_id=request.form.get('bensl_id'),
                 full_name=request.form.get('full_name'),
                 role=request.form.get('role'),
@@ -127,6 +138,9 @@ def add_employee():
             flash('Employee added successfully!', 'success')
             return redirect(url_for('employees'))
             
+        except IntegrityError:
+            db.session.rollback()
+            flash(f"An employee with System ID {request.form.get('system_id')} already exists.", 'error')
         except Exception as e:
             db.session.rollback()
             flash(f'Error adding employee: {str(e)}', 'error')
@@ -147,7 +161,7 @@ def edit_employee(id):
             employee.employment_type = request.form.get('employment_type')
             employee.billable_status = request.form.get('billable_status')
             employee.employee_status = request.form.get('employee_status')
-            employee.system_id = request.form.get('system_id')
+            employee.system_id = request.form.get('system_id', '').strip() or None
             employee.bensl_id = request.form.get('bensl_id')
             employee.full_name = request.form.get('full_name')
             employee.role = request.form.get('role')
@@ -182,6 +196,9 @@ def edit_employee(id):
             flash('Employee updated successfully!', 'success')
             return redirect(url_for('employees'))
             
+        except IntegrityError:
+            db.session.rollback()
+            flash(f"An employee with System ID {request.form.get('system_id')} already exists.", 'error')
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating employee: {str(e)}', 'error')
@@ -190,6 +207,8 @@ def edit_employee(id):
 
 @app.route('/employee/<int:id>')
 @login_required
+@read_only
+@query_budget(4)
 def employee_details(id):
     employee = Employee.query.get_or_404(id)
     
@@ -220,18 +239,111 @@ def delete_employee(id):
     
     return redirect(url_for('employees'))
 
+@app.route('/employees/offboard', methods=['POST'])
+@login_required
+def offboard_selected_employees():
+    """Deactivate or delete the employees ticked on the employee list"""
+    if not current_user.is_manager:
+        flash('Access denied. Only managers can offboard employees.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    ids = [int(i) for i in request.form.getlist('employee_ids') if i.isdigit()]
+    action = request.form.get('action', 'deactivate')
+    result = offboard_employees(current_user, ids=ids, action=action)
+    if result['success']:
+        verb = 'deleted' if action == 'delete' else 'deactivated'
+        flash(f'{result["count"]} employees {verb} successfully!', 'success')
+    else:
+        flash(f'Error offboarding employees: {"; ".join(result["errors"])}', 'error')
+    return redirect(url_for('employees'))
+
+@app.route('/api/employees/offboard', methods=['POST'])
+@login_required
+def api_offboard_employees():
+    """Bulk offboarding by selection or filter.
+
+    Body: {"action": "deactivate"|"delete", "ids": [...]} or
+    {"action": ..., "filter": {"company": "Vendor Ltd", "dol_before": "2025-09-30"}},
+    plus an optional "dol" (YYYY-MM-DD) recorded on deactivation.
+    """
+    if not current_user.is_manager:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    try:
+        ids = [int(i) for i in payload.get('ids') or []]
+        leaving_date = datetime.strptime(payload['dol'], '%Y-%m-%d').date() if payload.get('dol') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids must be integers and dol a YYYY-MM-DD date'}), 400
+    filters = payload.get('filter') or {}
+    if not isinstance(filters, dict) or not all(isinstance(value, str) for value in filters.values() if value is not None):
+        return jsonify({'error': f"filter must be an object of strings with keys from {', '.join(OFFBOARD_FILTERS)}, dol_before"}), 400
+    
+    result = offboard_employees(current_user, ids=ids, filters=filters,
+                                action=payload.get('action', 'deactivate'), leaving_date=leaving_date)
+    if not result['success']:
+        return jsonify({'error': 'No employees offboarded', 'errors': result['errors']}), 400
+    return jsonify({'action': payload.get('action', 'deactivate'), 'count': result['count']})
+
+@app.route('/employees/move', methods=['POST'])
+@login_required
+def move_selected_employees():
+    """Move the employees ticked on the employee list (with their reports) to another manager"""
+    if not current_user.is_manager:
+        flash('Access denied. Only managers can reassign employees.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    ids = [int(i) for i in request.form.getlist('employee_ids') if i.isdigit()]
+    new_manager_id = request.form.get('new_manager_id', type=int)
+    result = move_employees(current_user, new_manager_id, ids=ids)
+    if result['success']:
+        flash(f'{result["count"]} employees moved successfully!', 'success')
+    else:
+        flash(f'Error moving employees: {"; ".join(result["errors"])}', 'error')
+    return redirect(url_for('employees'))
+
+@app.route('/api/employees/move', methods=['POST'])
+@login_required
+def api_move_employees():
+    """Reassign employees or a whole team, with everyone below them, to a new manager.
+
+    Body: {"new_manager_id": 42, "ids": [...]} or {"new_manager_id": 42, "from_manager_id": 17}.
+    """
+    if not current_user.is_manager:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    try:
+        new_manager_id = int(payload['new_manager_id'])
+        ids = [int(i) for i in payload.get('ids') or []]
+        from_manager_id = int(payload['from_manager_id']) if payload.get('from_manager_id') is not None else None
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'new_manager_id is required; ids and from_manager_id must be integers'}), 400
+    
+    result = move_employees(current_user, new_manager_id, ids=ids, from_manager_id=from_manager_id)
+    if not result['success']:
+        return jsonify({'error': 'No employees moved', 'errors': result['errors']}), 400
+    return jsonify({'new_manager_id': new_manager_id, 'count': result['count']})
+
 @app.route('/feedback')
 @login_required
+@read_only
+@query_budget(3)
 def feedback():
     if not current_user.is_manager:
         flash('Access denied. Only managers can manage feedback.', 'error')
         return redirect(url_for('dashboard'))
     
-    # Get feedback given by current manager
-    feedback_list = Feedback.query.filter_by(manager_id=current_user.id)\
-                                 .order_by(Feedback.created_at.desc()).all()
+    # Get feedback given by current manager (current years only unless ?history=1)
+    history = request.args.get('history') == '1'
+    model = FeedbackHistory if history else Feedback
+    feedback_list = model.query.filter_by(manager_id=current_user.id)\
+                               .options(joinedload(model.received_by))\
+                               .order_by(model.created_at.desc()).all()
     
-    return render_template('feedback.html', feedback_list=feedback_list)
+    return render_template('feedback.html', feedback_list=feedback_list, history=history)
 
 @app.route('/feedback/add', methods=['GET', 'POST'])
 @login_required
@@ -279,6 +391,60 @@ def add_feedback():
     direct_reports = current_user.direct_reports
     return render_template('feedback_form.html', feedback=None, employees=direct_reports, action='Add')
 
+@app.route('/feedback/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_feedback():
+    if not current_user.is_manager:
+        flash('Access denied. Only managers can give feedback.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        # Shared period fields, then one value per employee row for the rest
+        defaults = {field: request.form.get(field)
+                    for field in ('feedback_type', 'period_year', 'period_month', 'period_quarter')}
+        columns = ('employee_id', 'performance_rating') + FEEDBACK_TEXT_FIELDS
+        values = [request.form.getlist(column) for column in columns]
+        entries = [dict(zip(columns, row)) for row in zip(*values)]
+        # Rows the manager left blank are not part of the submission
+        entries = [entry for entry in entries
+                   if any(entry.get(field) for field in ('performance_rating',) + FEEDBACK_TEXT_FIELDS)]
+        
+        result = create_bulk_feedback(current_user, entries, defaults)
+        if result['success']:
+            flash(f'Feedback added for {result["count"]} employees!', 'success')
+            return redirect(url_for('feedback'))
+        for error in result['errors'][:20]:
+            flash(error, 'error')
+    
+    direct_reports = current_user.direct_reports
+    return render_template('feedback_bulk_form.html', employees=direct_reports)
+
+@app.route('/api/feedback/bulk', methods=['POST'])
+@login_required
+@query_budget(4)
+def api_bulk_feedback():
+    """Submit feedback for many reports at once.
+
+    Body: {"feedback_type": "Quarterly", "period_year": 2025, "period_quarter": 3,
+    "entries": [{"employee_id": 12, "performance_rating": 4, "comments": "..."}, ...]}.
+    Top-level fields are defaults that each entry may override.
+    """
+    if not current_user.is_manager:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    entries = payload.get('entries')
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return jsonify({'error': 'entries must be a list of objects'}), 400
+    defaults = {key: value for key, value in payload.items() if key != 'entries'}
+    
+    result = create_bulk_feedback(current_user, entries, defaults)
+    if not result['success']:
+        return jsonify({'error': 'No feedback saved', 'errors': result['errors']}), 400
+    return jsonify({'count': result['count']}), 201
+
 @app.route('/feedback/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_feedback(id):
@@ -318,23 +484,31 @@ def edit_feedback(id):
 
 @app.route('/billing')
 @login_required
+@read_only
+@query_budget(3, streamed=4)
 def billing():
     if not current_user.is_manager:
         flash('Access denied. Only managers can view billing details.', 'error')
         return redirect(url_for('dashboard'))
     
     # Get billing details for employees under current manager
-    subordinate_ids = [emp.id for emp in current_user.get_all_subordinates()]
-    subordinate_ids.append(current_user.id)
+    subordinate_ids = db.session.query(current_user.subordinates_cte().c.id)
     
-    billing_records = BillingDetail.query.filter(BillingDetail.employee_id.in_(subordinate_ids))\
-                                        .order_by(BillingDetail.billing_year.desc(), 
-                                                BillingDetail.billing_month.desc()).all()
+    history = request.args.get('history') == '1'
+    model = BillingHistory if history else BillingDetail
+    billing_records = rows(model.query.filter(db.or_(model.employee_id.in_(subordinate_ids),
+                                                     model.employee_id == current_user.id))\
+                                     .options(joinedload(model.employee))\
+                                     .order_by(model.billing_year.desc(), 
+                                             model.billing_month.desc()))
     
-    return render_template('billing.html', billing_records=billing_records)
+    return render_page('billing.html', billing_records=billing_records, history=history)
 
 @app.route('/hierarchy')
 @login_required
+@read_only
+@query_budget(4)
+@conditional(lambda: scope_fingerprint())
 def hierarchy():
     # Get all employees and build hierarchy tree
     all_employees = Employee.query.all()
@@ -343,11 +517,8 @@ def hierarchy():
     manager_reports = {}
     employee_dict = {emp.id: emp for emp in all_employees}
     
-    # Initialize direct_reports list for each employee
-    for emp in all_employees:
-        emp.direct_reports = []
-    
     # Build the hierarchy relationships
+    reports = {emp.id: [] for emp in all_employees}
     top_managers = []
     for emp in all_employees:
         if emp.manager_id is None:
@@ -355,17 +526,22 @@ def hierarchy():
             top_managers.append(emp)
         else:
             # This employee has a manager
-            manager = employee_dict.get(emp.manager_id)
-            if manager:
-                manager.direct_reports.append(emp)
+            if emp.manager_id in reports:
+                reports[emp.manager_id].append(emp)
     
-    # Sort direct reports by name for each manager
+    # Attach sorted direct reports without lazy-loading (or dirtying) the relationship
     for emp in all_employees:
-        emp.direct_reports.sort(key=lambda x: x.full_name or '')
+        emp_reports = sorted(reports[emp.id], key=lambda x: x.full_name or '')
+        set_committed_value(emp, 'direct_reports', emp_reports)
+        for report in emp_reports:
+            set_committed_value(report, 'manager', emp)
     
     # Sort top managers by name
     top_managers.sort(key=lambda x: x.full_name or '')
     
+    # Subtree headcount/billing figures for every node, from the rows already loaded
+    rollups = compute_subtree_rollups(all_employees)
+    
     # If user is not a top manager and not viewing all, show only their hierarchy
     if current_user.manager_id is not None and not current_user.is_manager:
         # Find the root manager for current user
@@ -378,7 +554,36 @@ def hierarchy():
                 break
         top_managers = [root_manager] if root_manager else [current_user]
     
-    return render_template('hierarchy.html', top_managers=top_managers)
+    # The tree needs every row before it can be drawn, so only the HTML is streamed
+    return render_page('hierarchy.html', top_managers=top_managers, rollups=rollups)
+
+@app.route('/api/hierarchy/rollup')
+@app.route('/api/hierarchy/rollup/<int:id>')
+@login_required
+@read_only
+@query_budget(5)
+def hierarchy_rollup(id=None):
+    """Subtree rollup for one node (default: the caller) and each of its direct reports"""
+    node = current_user if id is None or id == current_user.id else db.session.get(Employee, id)
+    if node is None:
+        return jsonify({'error': 'Not found'}), 404
+    if node.id != current_user.id and not current_user.can_manage(node):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Only the projected columns of the node's subtree, aggregated in one pass
+    tree = node.subordinates_cte()
+    rollup_rows = db.session.execute(
+        db.select(*(getattr(Employee, column) for column in ROLLUP_COLUMNS))
+        .where(db.or_(Employee.id == node.id, Employee.id.in_(db.select(tree.c.id))))
+    ).all()
+    rollups = compute_subtree_rollups(rollup_rows)
+    names = {row.id: row.full_name for row in rollup_rows}
+    children = sorted((row for row in rollup_rows if row.manager_id == node.id and row.id != node.id),
+                      key=lambda row: row.full_name or '')
+    
+    return jsonify(dict(rollups[node.id], id=node.id, full_name=names[node.id], children=[
+        dict(rollups[child.id], id=child.id, full_name=child.full_name) for child in children
+    ]))
 
 @app.route('/import_excel', methods=['GET', 'POST'])
 @login_required
@@ -392,18 +597,27 @@ def import_excel():
             flash('No file selected', 'error')
             return redirect(request.url)
         
-        file = request.files['file']
-        if file.filename == '':
+        # Several workbooks may be uploaded at once (multiple "file" fields)
+        files = [file for file in request.files.getlist('file') if file.filename != '']
+        if not files:
             flash('No file selected', 'error')
             return redirect(request.url)
         
-        if file and allowed_file(file.filename):
+        if all(allowed_file(file.filename) for file in files):
             try:
-                filename = secure_filename(file.filename)
-                result = process_excel_file(file, current_user.id)
+                for file in files:
+                    file.filename = secure_filename(file.filename)
+                mode = request.form.get('mode', 'insert')
+                if mode not in IMPORT_MODES:
+                    mode = 'insert'
+                result = process_excel_file(files, current_user.id, mode=mode,
+                                            all_sheets=request.form.get('sheets') == 'all',
+                                            workers=app.config['IMPORT_WORKERS'])
                 
                 if result['success']:
                     success_msg = f'Successfully imported {result["count"]} employees'
+                    if mode == 'merge':
+                        success_msg += f', updated {result["updated"]} ({result["unchanged"]} unchanged)'
                     if result['skipped'] > 0:
                         success_msg += f' (skipped {result["skipped"]} duplicates)'
                     
@@ -437,16 +651,59 @@ def import_excel():
 # API endpoints for charts
 @app.route('/api/dashboard_data')
 @login_required
+@read_only
+@query_budget(4)
+@conditional(lambda: own_scope_fingerprint())
 def dashboard_data():
-    if current_user.is_manager:
-        subordinates = current_user.get_all_subordinates()
-        employees_in_scope = subordinates + [current_user]
-    else:
-        employees_in_scope = [current_user]
+    analytics = get_scope_analytics(current_user)
+    return jsonify(analytics)
+
+@app.route('/api/feedback_analytics')
+@login_required
+@read_only
+@query_budget(4)
+def feedback_analytics():
+    """Rating rollups for the caller's subtree: ?granularity=quarter&year_from=2024&year_to=2025"""
+    if not current_user.is_manager:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    granularity = request.args.get('granularity', 'quarter')
+    if granularity not in FEEDBACK_GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(FEEDBACK_GRANULARITIES)}"}), 400
     
-    analytics = get_dashboard_analytics(employees_in_scope)
+    analytics = get_feedback_analytics(current_user,
+                                       year_from=request.args.get('year_from', type=int),
+                                       year_to=request.args.get('year_to', type=int),
+                                       granularity=granularity)
     return jsonify(analytics)
 
+@app.route('/metrics')
+def prometheus_metrics():
+    if not app.config.get('METRICS_ENABLED'):
+        abort(404)
+    return Response(metrics.render() + render_pool_metrics(db.engines) + cache.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    # Profiles expose code paths, so only top-level managers can see them
+    if not current_user.is_manager or current_user.manager_id is not None:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_endpoint = request.args.get('limit', 10, type=int)
+    return jsonify({
+        'enabled': app.config['PROFILING_ENABLED'],
+        'profiles': list_profiles(app.config['PROFILE_DIR'], per_endpoint)
+    })
+
+@app.route('/admin/profiles/<path:filename>')
+@login_required
+def download_profile(filename):
+    if not current_user.is_manager or current_user.manager_id is not None:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return send_from_directory(os.path.abspath(app.config['PROFILE_DIR']), filename, as_attachment=True)
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
@@ -467,6 +724,10 @@ def import_results():
 
 @app.route('/api/employee/<int:id>')
 @login_required
+@read_only
+@query_budget(4)
+@conditional(lambda id: scope_fingerprint(Employee.id == id)
+             if current_user.is_manager or current_user.id == id else None)
 def api_employee_details(id):
     employee = Employee.query.get_or_404(id)
     
@@ -476,6 +737,88 @@ def api_employee_details(id):
             return jsonify({'error': 'Access denied'}), 403
     
     return jsonify(employee.to_dict())
+
+# Upper bound on ids per /api/employees/batch call
+BATCH_EMPLOYEE_LIMIT = 500
+
+@app.route('/api/employees/batch', methods=['GET', 'POST'])
+@login_required
+@read_only
+@query_budget(3)
+def api_employees_batch():
+    """Fetch many employees in one query, optionally restricted to some fields.
+
+    GET ?ids=1,2,3&fields=full_name,location or POST {"ids": [...], "fields": [...]}.
+    Ids outside the caller's scope (their subtree and themselves) are reported
+    as missing, exactly like ids that do not exist.
+    """
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        raw_ids = payload.get('ids') or []
+        fields = payload.get('fields') or list(Employee.API_FIELDS)
+        if not isinstance(raw_ids, list):
+            return jsonify({'error': 'ids must be a list of integers'}), 400
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            return jsonify({'error': 'fields must be a list of field names'}), 400
+    else:
+        raw_ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or list(Employee.API_FIELDS)
+    
+    try:
+        ids = list(dict.fromkeys(int(i) for i in raw_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids must be integers'}), 400
+    if not ids:
+        return jsonify({'error': 'No ids given'}), 400
+    if len(ids) > BATCH_EMPLOYEE_LIMIT:
+        return jsonify({'error': f'At most {BATCH_EMPLOYEE_LIMIT} ids per request'}), 400
+    unknown = [f for f in fields if f not in Employee.API_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    if 'id' not in fields:
+        fields = ['id'] + list(fields)
+    
+    # One statement: requested columns for requested ids, limited to the caller's scope
+    query = db.select(*(getattr(Employee, f) for f in fields)).where(Employee.id.in_(ids))
+    if current_user.is_manager:
+        scope = db.select(current_user.subordinates_cte().c.id)
+        query = query.where(db.or_(Employee.id.in_(scope), Employee.id == current_user.id))
+    else:
+        query = query.where(Employee.id == current_user.id)
+    
+    employees = {}
+    for row in db.session.execute(query).mappings():
+        employees[row['id']] = {key: value.isoformat() if isinstance(value, date) else value
+                                for key, value in row.items()}
+    
+    return jsonify({
+        'employees': [employees[i] for i in ids if i in employees],
+        'missing': [i for i in ids if i not in employees]
+    })
+
+@app.route('/api/employees/search')
+@login_required
+@read_only
+@query_budget(5)
+def api_search_employees():
+    """Ranked full-text search over the caller's scope: ?q=...&page=1&per_page=20"""
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_PER_PAGE)
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+    
+    total, results = search_employees(current_user, query, page=page, per_page=per_page)
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': results
+    })
+
 @app.route('/download_template')
 @login_required
 def download_template():
@@ -0,0 +1,158 @@
+# search.py
+import logging
+import re
+from sqlalchemy import DDL, event, func, literal, literal_column, or_, select, text
+from sqlalchemy.orm import aliased
+from app import db
+from models import Employee
+
+logger = logging.getLogger(__name__)
+
+# Indexed columns with their bm25 weights (SQLite) / tsvector weights (PostgreSQL)
+SEARCH_FIELDS = (
+    ('full_name', 10.0, 'A'),
+    ('emailid', 5.0, 'A'),
+    ('system_id', 5.0, 'A'),
+    ('designation', 2.0, 'B'),
+    ('skill', 2.0, 'B'),
+    ('remarks', 1.0, 'C'),
+)
+SEARCH_TABLE = 'employee_search'
+MAX_PER_PAGE = 100
+# Above this many raw hits, scope is checked by expanding the caller's subtree instead
+UPWARD_SCOPE_LIMIT = 2000
+MAX_CHAIN_DEPTH = 64
+
+_COLUMNS = ', '.join(name for name, _, _ in SEARCH_FIELDS)
+_NEW = ', '.join(f'new.{name}' for name, _, _ in SEARCH_FIELDS)
+_OLD = ', '.join(f'old.{name}' for name, _, _ in SEARCH_FIELDS)
+
+# External-content FTS5 table kept in sync by triggers, so ORM writes, bulk
+# Core inserts and raw SQL all update the index
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"{_COLUMNS}, content='employees', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON employees BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON employees BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {_COLUMNS} ON employees BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD}); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW}); END",
+]
+
+def _pg_document():
+    """Weighted tsvector expression; the GIN index and the queries must use exactly this"""
+    parts = [f"setweight(to_tsvector('simple', coalesce({name}, '')), '{weight}')"
+             for name, _, weight in SEARCH_FIELDS]
+    return '(' + ' || '.join(parts) + ')'
+
+# An expression index is maintained by PostgreSQL itself on every write
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_employees_search ON employees USING gin ({_pg_document()})",
+]
+
+def search_backend(engine):
+    """'fts5', 'tsvector' or 'like' (unindexed fallback) for this engine"""
+    if engine.dialect.name == 'postgresql':
+        return 'tsvector'
+    if engine.dialect.name == 'sqlite':
+        return 'fts5'
+    return 'like'
+
+def ensure_search_index(connection, rebuild=False):
+    """Create the search index for the connection's backend if it is missing.
+
+    On SQLite a newly created index (or rebuild=True) is populated from the
+    existing rows; PostgreSQL builds the GIN index as part of CREATE INDEX.
+    """
+    backend = search_backend(connection.engine)
+    if backend == 'fts5':
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (SEARCH_TABLE,)).first()
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild or not exists:
+            connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    elif backend == 'tsvector':
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+    else:
+        logger.warning('No full-text index for %s; search falls back to LIKE scans', connection.engine.dialect.name)
+
+@event.listens_for(Employee.__table__, 'after_create')
+def _create_search_index(table, connection, **kw):
+    ensure_search_index(connection)
+
+@event.listens_for(Employee.__table__, 'before_drop')
+def _drop_search_index(table, connection, **kw):
+    if search_backend(connection.engine) == 'fts5':
+        connection.execute(DDL(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+
+def search_terms(query):
+    """Word tokens of a user query; every term must match (as a prefix)"""
+    return re.findall(r'\w+', query.lower())[:10]
+
+def _matches(backend, terms):
+    """Subquery of (id, rank) for employees matching every term; lower rank is better"""
+    if backend == 'fts5':
+        weights = ', '.join(str(weight) for _, weight, _ in SEARCH_FIELDS)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return select(literal_column('rowid').label('id'),
+                      literal_column(f'bm25({SEARCH_TABLE}, {weights})').label('rank')) \
+            .select_from(text(SEARCH_TABLE)) \
+            .where(text(f'{SEARCH_TABLE} MATCH :match').bindparams(match=match)).subquery('matches')
+    if backend == 'tsvector':
+        document = literal_column(_pg_document())
+        tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        return select(Employee.id.label('id'), (-func.ts_rank(document, tsquery)).label('rank')) \
+            .where(document.op('@@')(tsquery)).subquery('matches')
+    fields = [getattr(Employee, name) for name, _, _ in SEARCH_FIELDS]
+    return select(Employee.id.label('id'), literal(0).label('rank')) \
+        .where(*(or_(*(field.ilike(f'%{term}%') for field in fields)) for term in terms)).subquery('matches')
+
+def _reports_to(user, candidates):
+    """Ids among `candidates` whose management chain reaches `user`, found by walking up from each one"""
+    parent = aliased(Employee)
+    chain = select(Employee.id.label('id'), Employee.manager_id.label('ancestor'), literal(1).label('depth')) \
+        .join(candidates, Employee.id == candidates.c.id).cte('chain', recursive=True)
+    # Depth cap instead of UNION so a manager_id cycle still terminates, without deduplication costs
+    chain = chain.union_all(
+        select(chain.c.id, parent.manager_id, chain.c.depth + 1)
+        .join(parent, parent.id == chain.c.ancestor)
+        .where(chain.c.ancestor != user.id, chain.c.depth < MAX_CHAIN_DEPTH))
+    return select(chain.c.id).where(chain.c.ancestor == user.id)
+
+def search_employees(user, query, page=1, per_page=20):
+    """Ranked page of employees in `user`'s scope (their subtree and themselves) matching `query`.
+
+    Returns (total, rows); each row has id, full_name, emailid, system_id,
+    designation, team and rank (lower is better on every backend).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return 0, []
+    matches = _matches(search_backend(db.engine), terms)
+
+    if not user.is_manager:
+        in_scope = Employee.id == user.id
+    else:
+        # Selective queries: check each hit's ancestors (cost ~ hits x depth).
+        # Broad ones: expand the subtree once (cost ~ subtree size).
+        hits = db.session.execute(select(func.count()).select_from(matches)).scalar()
+        if hits <= UPWARD_SCOPE_LIMIT:
+            in_scope = or_(Employee.id == user.id, Employee.id.in_(_reports_to(user, matches)))
+        else:
+            in_scope = or_(Employee.id == user.id, Employee.id.in_(select(user.subordinates_cte().c.id)))
+
+    ranked = select(Employee.id, Employee.full_name, Employee.emailid, Employee.system_id,
+                    Employee.designation, Employee.team, matches.c.rank) \
+        .join(matches, Employee.id == matches.c.id).where(in_scope).subquery()
+    # Window count gives the total alongside the page in a single statement
+    page_query = select(ranked, func.count().over().label('total')) \
+        .order_by(ranked.c.rank, ranked.c.full_name).limit(per_page).offset((page - 1) * per_page)
+    rows = db.session.execute(page_query).mappings().all()
+    if not rows and page > 1:
+        return db.session.execute(select(func.count()).select_from(ranked)).scalar(), []
+    total = rows[0]['total'] if rows else 0
+    return total, [{key: value for key, value in row.items() if key != 'total'} for row in rows]
@@ -0,0 +1,79 @@
+# streaming.py
+from flask import current_app, render_template, session, stream_template
+from flask.globals import app_ctx, request_ctx
+
+class RowStream:
+    """Iterable over a query that fetches rows in batches with yield_per.
+
+    Passed to templates in place of a list when pages are streamed, so rows
+    are loaded while the HTML around them is being sent. len() (and truth
+    testing) runs a COUNT query on first use.
+    """
+
+    def __init__(self, query, batch_size=None):
+        self.query = query
+        self.batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 500)
+        self._count = None
+
+    def __iter__(self):
+        return iter(self.query.yield_per(self.batch_size))
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.query.order_by(None).count()
+        return self._count
+
+    def __bool__(self):
+        return len(self) > 0
+
+def streaming_enabled():
+    """Whether this response may be streamed.
+
+    Pages with pending flash messages are always buffered: the session cookie
+    is written before a streamed body starts, so messages consumed while
+    streaming would be shown again on the next page.
+    """
+    return current_app.config.get('STREAM_RENDERING', False) and not session.get('_flashes')
+
+def rows(query):
+    """A RowStream when streaming, otherwise the fully loaded list"""
+    return RowStream(query) if streaming_enabled() else query.all()
+
+def _coalesce(body, size):
+    """Join the many small fragments Jinja yields into chunks of about `size` characters"""
+    pending, length = [], 0
+    for fragment in body:
+        pending.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            yield ''.join(pending)
+            pending, length = [], 0
+    if pending:
+        yield ''.join(pending)
+
+def _hold_contexts(body):
+    """Keep the app and request contexts open until `body` is exhausted or closed.
+
+    Flask tears the app context down when the view returns, before a streamed
+    body is produced; that would close the database session (detaching
+    current_user and ending the read transaction) halfway through the page.
+    Pushing both contexts again from inside the view postpones teardown to
+    the end of the stream.
+    """
+    contexts = (app_ctx._get_current_object(), request_ctx._get_current_object())
+
+    def generate():
+        with contexts[0], contexts[1]:
+            yield None
+            yield from body
+
+    stream = generate()
+    next(stream)  # enter the contexts now, while the view is still running
+    return stream
+
+def render_page(template_name, **context):
+    """stream_template when streaming is enabled, render_template otherwise"""
+    if streaming_enabled():
+        body = _coalesce(stream_template(template_name, **context), current_app.config.get('STREAM_CHUNK_SIZE', 16384))
+        return current_app.response_class(_hold_contexts(body))
+    return render_template(template_name, **context)
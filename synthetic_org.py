@@ -0,0 +1,167 @@
+# synthetic_org.py
+import random
+from datetime import date, timedelta
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+
+FIRST_NAMES = ['Aarav', 'Ananya', 'Rohan', 'Priya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rahul', 'Meera',
+               'Liam', 'Olivia', 'Noah', 'Emma', 'Lucas', 'Mia', 'Ethan', 'Sofia', 'Mason', 'Chloe']
+LAST_NAMES = ['Sharma', 'Patel', 'Singh', 'Kumar', 'Iyer', 'Reddy', 'Nair', 'Gupta', 'Mehta', 'Rao',
+              'Smith', 'Johnson', 'Brown', 'Taylor', 'Wilson', 'Martin', 'Clark', 'Lewis', 'Walker', 'Young']
+SKILLS = ['Python', 'Java', 'SQL', 'JavaScript', 'React', 'AWS', 'Azure', 'Kubernetes', 'Spark',
+          'Guidewire', 'Testing', 'DevOps', 'Angular', 'Scala', 'Power BI']
+LOCATIONS = ['Bangalore', 'Pune', 'Mumbai', 'Hyderabad', 'Chennai', 'Trivandrum', 'Sydney', 'Munich']
+TEAMS = ['UFS', 'RG']
+COMPANIES = ['Allianz Technology', 'Infosys', 'TCS', 'Wipro', 'Accenture']
+GRADES = ['L1', 'L2', 'L3', 'L4', 'L5', 'L6']
+MANAGER_DESIGNATIONS = ['Director', 'Senior Manager', 'Engineering Manager', 'Tech Lead']
+DESIGNATIONS = ['Software Engineer', 'Senior Developer', 'QA Engineer', 'Business Analyst',
+                'Data Engineer', 'DevOps Engineer', 'Architect']
+BILLING_STATUSES = ['Draft', 'Submitted', 'Approved', 'Paid']
+
+BATCH_SIZE = 5000
+
+def plan_hierarchy(size, depth, rng):
+    """Return a list of parent indexes (None for the root) describing an org of the given shape"""
+    # Span of control that reaches `size` people in roughly `depth` levels
+    span = max(2, round(size ** (1.0 / max(depth, 1))))
+    parents = [None]
+    level = [0]
+    for _ in range(depth):
+        next_level = []
+        for manager in level:
+            for _ in range(rng.randint(max(1, span // 2), span + span // 2)):
+                if len(parents) >= size:
+                    break
+                parents.append(manager)
+                next_level.append(len(parents) - 1)
+        if len(parents) >= size or not next_level:
+            break
+        level = next_level
+    # Spread anyone left over across the deepest manager level
+    i = 0
+    while len(parents) < size:
+        parents.append(level[i % len(level)])
+        i += 1
+    return parents
+
+def _bulk_insert(db, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+def generate_org(size=10000, depth=6, feedback_years=2, billing_months=12, seed=42,
+                 password='password123'):
+    """Bulk-insert a synthetic organization; return a summary dict.
+
+    Must be called inside an application context. Employees get explicit ids
+    after the current maximum so manager links can be written in one pass.
+    """
+    from app import db
+    from models import Employee, Feedback, BillingDetail
+
+    rng = random.Random(seed)
+    parents = plan_hierarchy(size, depth, rng)
+    first_id = (db.session.query(func.max(Employee.id)).scalar() or 0) + 1
+    password_hash = generate_password_hash(password)  # hashed once, shared by every synthetic account
+    has_reports = {parent for parent in parents if parent is not None}
+    today = date.today()
+
+    employees = []
+    for index, parent in enumerate(parents):
+        emp_id = first_id + index
+        is_manager = index in has_reports
+        billable = not is_manager and rng.random() < 0.8
+        doj = today - timedelta(days=rng.randint(30, 365 * 15))
+        employees.append({
+            'id': emp_id,
+            'employment_type': 'Permanent' if rng.random() < 0.7 else 'Contract',
+            'billable_status': 'Billable' if billable else 'Non-billable',
+            'employee_status': 'Active',
+            'system_id': f'SYN{emp_id:07d}',
+            'bensl_id': f'BSN{emp_id:07d}',
+            'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {emp_id}',
+            'role': 'Manager' if is_manager else 'Engineer',
+            'skill': ', '.join(rng.sample(SKILLS, rng.randint(1, 4))),
+            'team': rng.choice(TEAMS),
+            'manager_id': first_id + parent if parent is not None else None,
+            'critical': 'Yes' if rng.random() < 0.05 else 'No',
+            'doj_allianz': doj,
+            'doj_project': doj + timedelta(days=rng.randint(0, 60)),
+            'grade': rng.choice(GRADES),
+            'designation': rng.choice(MANAGER_DESIGNATIONS if is_manager else DESIGNATIONS),
+            'gender': rng.choice(['Male', 'Female']),
+            'company': rng.choice(COMPANIES),
+            'emailid': f'emp{emp_id}@synthetic.example',
+            'location': rng.choice(LOCATIONS),
+            'billing_rate': round(rng.uniform(20, 120), 2) if billable else None,
+            'rate_card': rng.choice(['Standard', 'Premium']) if billable else None,
+            'password_hash': password_hash,
+            'is_manager': is_manager,
+        })
+    for emp in employees:
+        if emp['manager_id'] is not None:
+            emp['manager_name'] = employees[emp['manager_id'] - first_id]['full_name']
+        else:
+            emp['manager_name'] = None
+    _bulk_insert(db, Employee, employees)
+    if db.engine.dialect.name == 'postgresql':
+        # Explicit ids bypass the serial sequence; move it past them
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('employees', 'id'), "
+                                "(SELECT max(id) FROM employees))"))
+
+    # Quarterly feedback from each employee's manager for the last `feedback_years` years
+    feedback = []
+    for emp in employees:
+        if emp['manager_id'] is None:
+            continue
+        for year in range(today.year - feedback_years + 1, today.year + 1):
+            for quarter in range(1, 5):
+                if year == today.year and quarter > (today.month - 1) // 3 + 1:
+                    break
+                feedback.append({
+                    'employee_id': emp['id'],
+                    'manager_id': emp['manager_id'],
+                    'feedback_type': 'Quarterly',
+                    'period_year': year,
+                    'period_quarter': quarter,
+                    'performance_rating': rng.choices([1, 2, 3, 4, 5], weights=[2, 8, 40, 35, 15])[0],
+                    'goals_achieved': 'Delivered planned sprint goals',
+                    'strengths': rng.choice(SKILLS),
+                    'comments': 'Synthetic review',
+                })
+    _bulk_insert(db, Feedback, feedback)
+
+    # Monthly billing for billable employees
+    billing = []
+    for emp in employees:
+        if emp['billing_rate'] is None:
+            continue
+        year, month = today.year, today.month
+        for _ in range(billing_months):
+            hours = rng.choice([120.0, 144.0, 160.0, 168.0])
+            billing.append({
+                'employee_id': emp['id'],
+                'billing_rate': emp['billing_rate'],
+                'currency': 'USD',
+                'project_name': f"Project {rng.randint(1, 50)}",
+                'client_name': 'Allianz',
+                'billing_month': month,
+                'billing_year': year,
+                'billable_hours': hours,
+                'total_amount': round(hours * emp['billing_rate'], 2),
+                'billing_status': rng.choice(BILLING_STATUSES),
+            })
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+    _bulk_insert(db, BillingDetail, billing)
+
+    db.session.commit()
+    return {
+        'employees': len(employees),
+        'managers': len(has_reports),
+        'feedback': len(feedback),
+        'billing': len(billing),
+        'root_id': first_id,
+        'last_id': first_id + len(employees) - 1,
+    }
@@ -1,8 +1,17 @@
 # utils.py
 import pandas as pd
 import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import re
+from database import serialized_writes
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 
@@ -10,185 +19,430 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_excel_file(file, manager_id):
-    """Process uploaded Excel file and create employee records"""
+IMPORT_MODES = ('insert', 'merge')
+# Keeps IN lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+# Spreadsheet column -> Employee field
+IMPORT_COLUMNS = {
+    'Employment_Type': 'employment_type',
+    'Billable_Status': 'billable_status',
+    'Employee_Status': 'employee_status',
+    'System_ID': 'system_id',
+    'Bensl_ID': 'bensl_id',
+    'Full_Name': 'full_name',
+    'Role': 'role',
+    'Skill': 'skill',
+    'Team': 'team',
+    'Manager_Name': 'manager_name',
+    'Manager_ID': 'manager_id',
+    'Critical': 'critical',
+    'DOJ_Allianz': 'doj_allianz',
+    'DOL_Allianz': 'dol_allianz',
+    'Grade': 'grade',
+    'Designation': 'designation',
+    'DOJ_Project': 'doj_project',
+    'DOL_Project': 'dol_project',
+    'Gender': 'gender',
+    'Company': 'company',
+    'Emailid': 'emailid',
+    'Location': 'location',
+    'Billing_Rate': 'billing_rate',
+    'Rate_Card': 'rate_card',
+    'Remarks': 'remarks'
+}
+DATE_COLUMNS = ('DOJ_Allianz', 'DOL_Allianz', 'DOJ_Project', 'DOL_Project')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y')
+
+def _convert_cell(excel_col, value):
+    """Normalize one non-empty cell to the value stored on Employee"""
+    if excel_col == 'Billing_Rate':
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return None
+    if excel_col == 'Manager_ID':
+        # Integer foreign key; Excel hands numbers over as floats
+        try:
+            return int(float(value))
+        except (ValueError, TypeError):
+            return None
+    if excel_col in DATE_COLUMNS:
+        if isinstance(value, str):
+            for date_format in DATE_FORMATS:
+                try:
+                    return datetime.strptime(value, date_format).date()
+                except ValueError:
+                    continue
+            return None
+        try:
+            return value.date() if hasattr(value, 'date') else None
+        except (ValueError, TypeError):
+            return None
+    return (str(value).strip() or None) if value else None
+
+def parse_import_sheet(path, filename, sheet_name=0, label='Row'):
+    """Read and normalize one sheet (or CSV file) of an import.
+
+    Runs in the import process pool, so it only touches the file and returns
+    plain data: {'fields', 'rows': [(row_label, employee_data)], 'errors',
+    'error', 'empty'}. Row labels start with `label`, e.g. "Row 5".
+    """
+    parsed = {'fields': [], 'rows': [], 'errors': [], 'error': None, 'empty': False}
+    try:
+        if filename.lower().endswith('.csv'):
+            df = pd.read_csv(path)
+        else:
+            df = pd.read_excel(path, sheet_name=sheet_name)
+    except Exception as e:
+        parsed['error'] = f"Failed to read Excel file: {str(e)}"
+        return parsed
+
+    # Skip completely empty rows
+    df = df.dropna(how='all')
+    if df.empty:
+        parsed['empty'] = True
+        return parsed
+
+    # Normalize column names (remove extra spaces, handle case variations)
+    df.columns = df.columns.astype(str).str.strip()
+    column_mapping = {excel_col: db_field for excel_col, db_field in IMPORT_COLUMNS.items()
+                      if excel_col in df.columns}
+    if not column_mapping:
+        parsed['error'] = f"No recognized columns found. Expected columns: {', '.join(IMPORT_COLUMNS)}"
+        return parsed
+    parsed['fields'] = list(column_mapping.values())
+
+    # Plain dicts are an order of magnitude cheaper to walk than iterrows()
+    records = df[list(column_mapping)].to_dict('records')
+    for index, record in zip(df.index, records):
+        row_label = f"{label} {index + 2}"
+        try:
+            employee_data = {}
+            for excel_col, db_field in column_mapping.items():
+                value = record[excel_col]
+                employee_data[db_field] = _convert_cell(excel_col, value) if pd.notna(value) else None
+
+            # Check if we have enough data to create an employee
+            if not employee_data.get('system_id') and not employee_data.get('full_name'):
+                parsed['errors'].append(f"{row_label}: Missing System ID or Full Name")
+                continue
+
+            parsed['rows'].append((row_label, employee_data))
+
+        except Exception as e:
+            parsed['errors'].append(f"{row_label}: Error processing row - {str(e)}")
+            continue
+
+    return parsed
+
+# Smaller uploads are parsed in the request worker; starting a pool costs more than it saves
+PARALLEL_IMPORT_MIN_BYTES = 512 * 1024
+
+_pool_context = None
+
+def _parse_in_pool(jobs, workers):
+    """parse_import_sheet over `jobs`, spread across up to `workers` processes (results in job order)"""
+    global _pool_context
+    if workers <= 1 or len(jobs) < 2:
+        return [parse_import_sheet(*job) for job in jobs]
+
+    if _pool_context is None:
+        # Never fork a threaded web worker: forkserver children start from a
+        # clean process that has already imported pandas and this module
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            _pool_context = multiprocessing.get_context('forkserver')
+            _pool_context.set_forkserver_preload(['pandas', 'openpyxl', __name__])
+        else:
+            _pool_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(min(workers, len(jobs)), mp_context=_pool_context) as pool:
+        return list(pool.map(parse_import_sheet, *zip(*jobs)))
+
+def _upload_name(file):
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.basename(file)
+    return os.path.basename(getattr(file, 'filename', None) or getattr(file, 'name', None) or 'upload.xlsx')
+
+def process_excel_file(files, manager_id, mode='insert', all_sheets=False, workers=1):
+    """Process uploaded Excel file(s) and create employee records.
+
+    `files` is one upload or a list of them; with all_sheets every sheet of
+    every workbook is imported, otherwise only the first one. Sheets are
+    parsed in up to `workers` processes and merged into a single duplicate
+    check and write, in file and sheet order.
+
+    In 'insert' mode rows whose System ID (or, without one, email) already
+    exists are skipped. In 'merge' mode existing employees are compared with
+    the file in bulk and only the changed columns of changed rows are written;
+    only employees in the importing manager's subtree can be updated, and
+    Manager_ID changes go through the same cycle check as move_employees.
+    """
     from app import db
     from models import Employee
+    from sqlalchemy import select
 
     result = {
         'success': False,
         'count': 0,
+        'updated': 0,
+        'unchanged': 0,
         'skipped': 0,
         'errors': [],
         'error': None
     }
+    if not isinstance(files, (list, tuple)):
+        files = [files]
 
     try:
-        # Read Excel file with multiple sheet support
-        try:
-            df = pd.read_excel(file, sheet_name=0)  # Read first sheet
-        except Exception as e:
-            result['error'] = f"Failed to read Excel file: {str(e)}"
-            return result
+        with tempfile.TemporaryDirectory(prefix='portal-import-') as workdir:
+            # Spool uploads to disk so pool workers read them by path instead of
+            # receiving a pickled copy of the workbook per sheet
+            jobs = []
+            for number, file in enumerate(files):
+                filename = _upload_name(file)
+                path = os.path.join(workdir, f'{number}-{filename}')
+                if isinstance(file, (str, os.PathLike)):
+                    shutil.copyfile(file, path)
+                elif hasattr(file, 'save'):
+                    file.save(path)
+                else:
+                    with open(path, 'wb') as out:
+                        shutil.copyfileobj(file, out)
+                if filename.lower().endswith('.csv'):
+                    sheet_names = [0]
+                else:
+                    try:
+                        with pd.ExcelFile(path) as workbook:
+                            sheet_names = workbook.sheet_names if all_sheets else workbook.sheet_names[:1]
+                    except Exception as e:
+                        result['error'] = f"Failed to read Excel file {filename}: {str(e)}"
+                        return result
+                jobs.extend((path, filename, sheet_name) for sheet_name in sheet_names)
+
+            # Single-sheet imports keep the plain "Row N" labels
+            multi = len(jobs) > 1
+            if sum(os.path.getsize(path) for path in set(job[0] for job in jobs)) < PARALLEL_IMPORT_MIN_BYTES:
+                workers = 1
+            parsed_sheets = _parse_in_pool(
+                [(path, filename, sheet_name, f"{filename} [{sheet_name}] row" if multi else 'Row')
+                 for path, filename, sheet_name in jobs],
+                workers)
 
-        if df.empty:
+        temp_employees, file_fields = [], []
+        for (_, filename, sheet_name), parsed in zip(jobs, parsed_sheets):
+            if parsed['error'] and not multi:
+                result['error'] = parsed['error']
+                return result
+            if parsed['error']:
+                # e.g. an instructions or summary sheet in a vendor workbook
+                result['errors'].append(f"{filename} [{sheet_name}]: skipped - {parsed['error']}")
+                continue
+            result['errors'].extend(parsed['errors'])
+            temp_employees.extend(parsed['rows'])
+            file_fields.extend(field for field in parsed['fields'] if field not in file_fields)
+
+        if all(parsed['empty'] for parsed in parsed_sheets):
             result['error'] = "Excel file is empty"
             return result
+        if not file_fields:
+            result['error'] = f"No recognized columns found. Expected columns: {', '.join(IMPORT_COLUMNS)}"
+            return result
 
-        # Normalize column names (remove extra spaces, handle case variations)
-        df.columns = df.columns.str.strip()
-
-        # Expected columns matching the database schema
-        expected_columns = {
-            'Employment_Type': 'employment_type',
-            'Billable_Status': 'billable_status', 
-            'Employee_Status': 'employee_status',
-            'System_ID': 'system_id',
-            'Bensl_ID': 'bensl_id',
-            'Full_Name': 'full_name',
-            'Role': 'role',
-            'Skill': 'skill',
-            'Team': 'team',
-            'Manager_Name': 'manager_name',
-            'Manager_ID': 'manager_id',
-            'Critical': 'critical',
-            'DOJ_Allianz': 'doj_allianz',
-            'DOL_Allianz': 'dol_allianz',
-            'Grade': 'grade',
-            'Designation': 'designation',
-            'DOJ_Project': 'doj_project',
-            'DOL_Project': 'dol_project',
-            'Gender': 'gender',
-            'Company': 'company',
-            'Emailid': 'emailid',
-            'Location': 'location',
-            'Billing_Rate': 'billing_rate',
-            'Rate_Card': 'rate_card',
-            'Remarks': 'remarks'
-        }
+        # Look up existing employees for the whole import at once (by system_id, or emailid without one)
+        existing = find_employees_by_system_id(
+            [data['system_id'] for _, data in temp_employees if data.get('system_id')],
+            file_fields if mode == 'merge' else [])
+        emails = [data['emailid'] for _, data in temp_employees if not data.get('system_id') and data.get('emailid')]
+        existing_emails = set()
+        for chunk in _chunks(set(emails)):
+            existing_emails.update(db.session.execute(
+                db.select(Employee.emailid).where(Employee.emailid.in_(chunk))).scalars())
+        if mode == 'merge' and existing:
+            # Merging may only touch the importing manager's reports, direct or indirect
+            tree = db.session.get(Employee, manager_id).subordinates_cte()
+            in_scope = set(db.session.execute(select(tree.c.id)).scalars())
 
-        # Validate that we have at least one recognizable column
-        found_columns = []
-        column_mapping = {}
+        new_employees, changes, reassignments, seen = [], [], [], set()
+        for row_label, employee_data in temp_employees:
+            system_id = employee_data.get('system_id')
+            key = system_id or employee_data.get('emailid')
+            if key and key in seen:
+                result['skipped'] += 1
+                result['errors'].append(f"{row_label}: Duplicate of an earlier row for {key}")
+                continue
+            seen.add(key)
 
-        for excel_col, db_field in expected_columns.items():
-            if excel_col in df.columns:
-                found_columns.append(excel_col)
-                column_mapping[excel_col] = db_field
+            if system_id in existing and mode == 'merge':
+                current = existing[system_id]
+                if current['id'] not in in_scope:
+                    result['skipped'] += 1
+                    result['errors'].append(f"{row_label}: Employee with System ID {system_id} is not in your reporting tree")
+                    continue
+                # Blank cells leave the stored value alone, as they do for new employees
+                changed = {field: value for field, value in employee_data.items()
+                           if value is not None and field != 'system_id' and current[field] != value}
+                new_manager_id = changed.pop('manager_id', None)
+                if new_manager_id is not None:
+                    reassignments.append((row_label, current['id'], new_manager_id, bool(changed)))
+                if changed:
+                    changes.append((system_id, changed))
+                elif new_manager_id is None:
+                    result['unchanged'] += 1
+            elif system_id in existing or (not system_id and employee_data.get('emailid') in existing_emails):
+                result['skipped'] += 1
+                result['errors'].append(f"{row_label}: Employee with System ID {system_id} already exists")
+            else:
+                new_employees.append(employee_data)
 
-        if not found_columns:
-            result['error'] = f"No recognized columns found. Expected columns: {', '.join(expected_columns.keys())}"
-            return result
+        # Second pass: write to the database (as the only writer on SQLite)
+        with serialized_writes(db):
+            if changes:
+                result['updated'] = merge_imported_employees(changes)
+            if reassignments:
+                reassign_imported_employees(reassignments, manager_id, result)
+            create_imported_employees(new_employees, manager_id, result)
+        result['success'] = True
 
-        # Store employee data for processing
-        temp_employees = []
+    except Exception as e:
+        db.session.rollback()
+        result['error'] = f"Unexpected error: {str(e)}"
 
-        # Process each row in the Excel file
-        for index, row in df.iterrows():
-            try:
-                # Skip completely empty rows
-                if row.isna().all():
-                    continue
+    return result
 
-                # Create employee data dictionary
-                employee_data = {}
-
-                # Map Excel columns to database fields
-                for excel_col, db_field in column_mapping.items():
-                    value = row.get(excel_col)
-                    if pd.notna(value):
-                        if excel_col in ['Billing_Rate']:
-                            # Handle numeric fields
-                            try:
-                                employee_data[db_field] = float(value)
-                            except (ValueError, TypeError):
-                                employee_data[db_field] = None
-                        elif excel_col in ['DOJ_Allianz', 'DOL_Allianz', 'DOJ_Project', 'DOL_Project']:
-                            # Handle date fields
-                            try:
-                                if isinstance(value, str):
-                                    # Try multiple date formats
-                                    for date_format in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y']:
-                                        try:
-                                            employee_data[db_field] = datetime.strptime(value, date_format).date()
-                                            break
-                                        except ValueError:
-                                            continue
-                                    else:
-                                        employee_data[db_field] = None
-                                else:
-                                    employee_data[db_field] = value.date() if hasattr(value, 'date') else None
-                            except (ValueError, TypeError):
-                                employee_data[db_field] = None
-                        else:
-                            # Handle text fields
-                            employee_data[db_field] = str(value).strip() if value else None
-                    else:
-                        employee_data[db_field] = None
-
-                # Check if we have enough data to create an employee
-                if not employee_data.get('system_id') and not employee_data.get('full_name'):
-                    result['errors'].append(f"Row {index + 2}: Missing System ID or Full Name")
-                    continue
+def find_employees_by_system_id(system_ids, fields):
+    """Current values of `fields` for the employees with these system_ids, keyed by system_id"""
+    from app import db
+    from models import Employee
 
-                # Check if employee already exists (by system_id or emailid)
-                existing_employee = None
-                if employee_data.get('system_id'):
-                    existing_employee = Employee.query.filter_by(system_id=employee_data['system_id']).first()
-                elif employee_data.get('emailid'):
-                    existing_employee = Employee.query.filter_by(emailid=employee_data['emailid']).first()
+    columns = [Employee.id, Employee.system_id] + [getattr(Employee, field) for field in fields
+                                                   if field not in ('id', 'system_id')]
+    existing = {}
+    for chunk in _chunks(set(system_ids)):
+        for row in db.session.execute(db.select(*columns).where(Employee.system_id.in_(chunk))).mappings():
+            existing[row['system_id']] = row
+    return existing
 
-                if existing_employee:
-                    result['skipped'] += 1
-                    result['errors'].append(f"Row {index + 2}: Employee with System ID {employee_data.get('system_id')} already exists")
-                    continue
+def merge_imported_employees(changes):
+    """Write (system_id, {field: value}) changes as set-based upserts; return the number of rows written.
 
-                temp_employees.append(employee_data)
+    Rows are grouped by which columns changed, and each group is a single
+    executemany INSERT ... ON CONFLICT (system_id) DO UPDATE touching only
+    those columns. Needs the unique index on employees.system_id.
+    """
+    from app import db
+    from models import Employee
 
-            except Exception as e:
-                result['errors'].append(f"Row {index + 2}: Error processing row - {str(e)}")
-                continue
+    groups = {}
+    for system_id, changed in changes:
+        groups.setdefault(tuple(sorted(changed)), []).append(dict(changed, system_id=system_id))
 
-        # Second pass: Create employees in database
-        for emp_data in temp_employees:
-            try:
-                employee = Employee()
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
 
-                # Map all the fields from employee_data to Employee model
-                for field, value in emp_data.items():
-                    if hasattr(employee, field) and value is not None:
-                        setattr(employee, field, value)
+    now = datetime.utcnow()
+    for fields, rows in groups.items():
+        if insert is None:
+            # No portable upsert: update the already-matched rows by system_id instead
+            for row in rows:
+                Employee.query.filter_by(system_id=row['system_id']).update(
+                    {field: row[field] for field in fields}, synchronize_session=False)
+            continue
+        statement = insert(Employee.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Employee.system_id],
+            set_=dict({field: statement.excluded[field] for field in fields}, updated_at=now))
+        db.session.execute(statement, rows)
+    return len(changes)
 
-                # Set default manager to importing user
-                if not employee.manager_id:
-                    employee.manager_id = manager_id
+def reassign_imported_employees(reassignments, importer_id, result):
+    """Apply Manager_ID changes from a merge import, one row at a time.
 
-                # Set default values for required fields if not provided
-                if not employee.employment_type:
-                    employee.employment_type = 'Permanent'
-                if not employee.billable_status:
-                    employee.billable_status = 'Billable'
-                if not employee.employee_status:
-                    employee.employee_status = 'Active'
+    `reassignments` are (row_label, employee_id, new_manager_id, counted)
+    tuples, `counted` meaning the row was already written (and counted) by
+    merge_imported_employees. Each new manager's chain is read after the
+    previous rows were applied, so changes within one file cannot form a
+    cycle between them either. Rejected rows are reported as errors.
+    """
+    from app import db
+    from models import Employee
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import aliased
 
-                # Set default password
-                employee.set_password('password123')
+    parent = aliased(Employee)
+    now = datetime.utcnow()
+    for row_label, employee_id, new_manager_id, counted in reassignments:
+        ancestors = manager_chain(new_manager_id)
+        if new_manager_id not in ancestors:
+            error = f"Manager ID {new_manager_id} not found"
+        elif importer_id not in ancestors:
+            error = f"Manager ID {new_manager_id} is not in your reporting tree"
+        elif employee_id in ancestors:
+            error = "Cannot report to themselves or one of their reports"
+        else:
+            db.session.execute(
+                update(Employee).where(Employee.id == employee_id)
+                .values(manager_id=new_manager_id, updated_at=now,
+                        manager_name=select(parent.full_name).where(parent.id == new_manager_id).scalar_subquery())
+                .execution_options(synchronize_session=False))
+            if not counted:
+                result['updated'] += 1
+            continue
+        result['errors'].append(f"{row_label}: {error}")
+        if not counted:
+            result['skipped'] += 1
 
-                db.session.add(employee)
-                result['count'] += 1
+def create_imported_employees(temp_employees, manager_id, result):
+    """Insert parsed employee rows and commit"""
+    from app import db
+    from models import Employee
+    from werkzeug.security import generate_password_hash
 
-            except Exception as e:
-                result['errors'].append(f"Failed to create employee: {str(e)}")
-                continue
+    # Every imported account starts with the same default password; hash it once
+    # rather than once per row while holding the write lock
+    default_password_hash = generate_password_hash('password123')
 
-        db.session.commit()
-        result['success'] = True
+    for emp_data in temp_employees:
+        try:
+            employee = Employee()
 
-    except Exception as e:
-        db.session.rollback()
-        result['error'] = f"Unexpected error: {str(e)}"
+            # Map all the fields from employee_data to Employee model
+            for field, value in emp_data.items():
+                if hasattr(employee, field) and value is not None:
+                    setattr(employee, field, value)
 
-    return result
+            # Set default manager to importing user
+            if not employee.manager_id:
+                employee.manager_id = manager_id
+
+            # Set default values for required fields if not provided
+            if not employee.employment_type:
+                employee.employment_type = 'Permanent'
+            if not employee.billable_status:
+                employee.billable_status = 'Billable'
+            if not employee.employee_status:
+                employee.employee_status = 'Active'
+
+            # Set default password
+            employee.password_hash = default_password_hash
+
+            db.session.add(employee)
+            result['count'] += 1
+
+        except Exception as e:
+            result['errors'].append(f"Failed to create employee: {str(e)}")
+            continue
+
+    db.session.commit()
 
 def get_dashboard_analytics(employees):
     """Generate analytics data for dashboard charts"""
@@ -237,6 +491,527 @@ def get_dashboard_analytics(employees):
 
     return analytics
 
+def get_scope_analytics(user):
+    """Dashboard analytics for `user` and their subtree, served from the shared cache when possible"""
+    from cache import cache
+
+    def compute():
+        employees = user.get_all_subordinates() + [user] if user.is_manager else [user]
+        return get_dashboard_analytics(employees)
+
+    return cache.get_or_set(f'dashboard_analytics:{user.id}', compute)
+
+# Projection needed by compute_subtree_rollups
+ROLLUP_COLUMNS = ('id', 'full_name', 'manager_id', 'billable_status', 'billing_rate', 'critical')
+
+def compute_subtree_rollups(rows):
+    """Headcount, billable split, average billing rate and critical count for every node's subtree.
+
+    `rows` are employees (or rows with the ROLLUP_COLUMNS attributes). Totals
+    are accumulated bottom-up in a single pass over the tree in reverse
+    pre-order, so children are always folded into their parent before the
+    parent is folded into its own: O(n) overall. Nodes caught in a
+    manager_id cycle only count themselves. Returns {id: rollup}.
+    """
+    rows = list(rows)
+    position = {row.id: i for i, row in enumerate(rows)}
+    size = len(rows)
+    parent = [position.get(row.manager_id, -1) for row in rows]
+    headcount = [1] * size
+    direct_reports = [0] * size
+    billable, non_billable, critical = [0] * size, [0] * size, [0] * size
+    rate_total, rate_count = [0.0] * size, [0] * size
+    children = [[] for _ in range(size)]
+    for i, row in enumerate(rows):
+        status = (row.billable_status or '').strip().lower()
+        billable[i] = 1 if status == 'billable' else 0
+        non_billable[i] = 1 if status.startswith('non') else 0
+        critical[i] = 1 if (row.critical or '').strip().lower() == 'yes' else 0
+        if row.billing_rate is not None:
+            rate_total[i], rate_count[i] = row.billing_rate, 1
+        if parent[i] == i:
+            parent[i] = -1
+        if parent[i] >= 0:
+            children[parent[i]].append(i)
+            direct_reports[parent[i]] += 1
+
+    order, stack = [], [i for i in range(size) if parent[i] < 0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(children[node])
+    for node in reversed(order):
+        up = parent[node]
+        if up >= 0:
+            headcount[up] += headcount[node]
+            billable[up] += billable[node]
+            non_billable[up] += non_billable[node]
+            critical[up] += critical[node]
+            rate_total[up] += rate_total[node]
+            rate_count[up] += rate_count[node]
+
+    return {
+        row.id: {
+            'headcount': headcount[i],
+            'direct_reports': direct_reports[i],
+            'billable': billable[i],
+            'non_billable': non_billable[i],
+            'critical': critical[i],
+            'avg_billing_rate': round(rate_total[i] / rate_count[i], 2) if rate_count[i] else None,
+        }
+        for i, row in enumerate(rows)
+    }
+
+FEEDBACK_GRANULARITIES = ('year', 'quarter', 'month')
+RATING_SCALE = range(1, 6)
+
+def _rating_aggregates(rating):
+    """count, sum and per-value counts of a rating column, as SQL aggregates"""
+    from sqlalchemy import case, func
+
+    return [func.count(rating).label('count'), func.sum(rating).label('total')] + \
+        [func.sum(case((rating == value, 1), else_=0)).label(f'r{value}') for value in RATING_SCALE]
+
+def _rating_summary(count, total, distribution):
+    return {
+        'count': count,
+        'average': round(total / count, 2) if count else None,
+        'distribution': {str(value): distribution[i] for i, value in enumerate(RATING_SCALE)}
+    }
+
+def get_feedback_analytics(manager, year_from=None, year_to=None, granularity='quarter'):
+    """Rating averages and distributions per employee, team and period across a manager's subtree.
+
+    Everything is aggregated in SQL: one statement grouped by (team, period),
+    from which the team, period, trend and overall figures are summed, and one
+    grouped by employee. Quarterly feedback is left out of monthly rollups.
+    Archived rows are only read when year_from reaches back past the archive
+    horizon (or is not given).
+    """
+    from app import db
+    from archive import needs_history
+    from models import Employee, Feedback, FeedbackHistory
+    from sqlalchemy import func, select
+
+    source = FeedbackHistory if needs_history(year_from) else Feedback
+
+    tree = manager.subordinates_cte()
+    conditions = [source.employee_id.in_(select(tree.c.id)), source.performance_rating.isnot(None)]
+    if year_from is not None:
+        conditions.append(source.period_year >= year_from)
+    if year_to is not None:
+        conditions.append(source.period_year <= year_to)
+    if granularity == 'month':
+        period = source.period_month
+        conditions.append(period.isnot(None))
+    elif granularity == 'quarter':
+        period = func.coalesce(source.period_quarter, (source.period_month + 2) // 3)
+    else:
+        period = None
+    period_columns = [source.period_year.label('year')] + ([period.label('period')] if period is not None else [])
+    aggregates = _rating_aggregates(source.performance_rating)
+    team = func.coalesce(Employee.team, 'Unknown').label('team')
+
+    team_period_rows = db.session.execute(
+        select(team, *period_columns, *aggregates)
+        .join(Employee, Employee.id == source.employee_id)
+        .where(*conditions)
+        .group_by(team, *period_columns)
+    ).mappings().all()
+    employee_rows = db.session.execute(
+        select(Employee.id, Employee.full_name, team, *aggregates)
+        .join(source, source.employee_id == Employee.id)
+        .where(*conditions)
+        .group_by(Employee.id, Employee.full_name, team)
+        .order_by(Employee.full_name)
+    ).mappings().all()
+
+    def period_label(row):
+        if granularity == 'year':
+            return str(row['year'])
+        if granularity == 'quarter':
+            return f"{row['year']}-Q{row['period']}"
+        return f"{row['year']}-{row['period']:02d}"
+
+    # Roll the (team, period) cells up into teams, periods and the overall total
+    def accumulate(totals, key, row):
+        cell = totals.setdefault(key, [0, 0, [0] * len(RATING_SCALE)])
+        cell[0] += row['count']
+        cell[1] += row['total'] or 0
+        for i, value in enumerate(RATING_SCALE):
+            cell[2][i] += row[f'r{value}'] or 0
+
+    by_team, by_period, team_periods, overall = {}, {}, {}, {}
+    for row in team_period_rows:
+        label = period_label(row)
+        sort_key = (row['year'], row.get('period') or 0)
+        accumulate(by_team, row['team'], row)
+        accumulate(by_period, (sort_key, label), row)
+        accumulate(team_periods, (row['team'], sort_key, label), row)
+        accumulate(overall, None, row)
+
+    trend, previous = [], None
+    for (_, label), cell in sorted(by_period.items()):
+        point = dict(_rating_summary(*cell), period=label)
+        point['change'] = round(point['average'] - previous, 2) if previous is not None else None
+        previous = point['average']
+        trend.append(point)
+
+    team_trends = {}
+    for (team_name, _, label), cell in sorted(team_periods.items()):
+        summary = _rating_summary(*cell)
+        team_trends.setdefault(team_name, []).append({'period': label, 'count': summary['count'],
+                                                       'average': summary['average']})
+
+    return {
+        'granularity': granularity,
+        'summary': _rating_summary(*overall.get(None, [0, 0, [0] * len(RATING_SCALE)])),
+        'by_team': {name: _rating_summary(*cell) for name, cell in sorted(by_team.items())},
+        'by_period': trend,
+        'team_trends': team_trends,
+        'by_employee': [
+            dict(_rating_summary(row['count'], row['total'] or 0,
+                                 [row[f'r{value}'] or 0 for value in RATING_SCALE]),
+                 employee_id=row['id'], full_name=row['full_name'], team=row['team'])
+            for row in employee_rows
+        ]
+    }
+
+# Upper bound on entries per bulk feedback submission
+BULK_FEEDBACK_LIMIT = 500
+FEEDBACK_TEXT_FIELDS = ('goals_achieved', 'areas_of_improvement', 'strengths', 'comments')
+
+def _whole_number(value):
+    """int(value), refusing the fractions and booleans int() would silently accept"""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+def _parse_feedback_entry(entry, defaults):
+    """Validate one bulk feedback entry; return (row, error)"""
+    merged = {**defaults, **{key: value for key, value in entry.items() if value not in (None, '')}}
+    try:
+        employee_id = _whole_number(merged.get('employee_id'))
+    except (TypeError, ValueError):
+        return None, 'employee_id is required'
+    feedback_type = merged.get('feedback_type')
+    if feedback_type not in ('Monthly', 'Quarterly'):
+        return None, 'feedback_type must be Monthly or Quarterly'
+    try:
+        period_year = _whole_number(merged.get('period_year'))
+        rating = merged.get('performance_rating')
+        rating = _whole_number(rating) if rating is not None else None
+        if feedback_type == 'Monthly':
+            period_month, period_quarter = _whole_number(merged.get('period_month')), None
+            if not 1 <= period_month <= 12:
+                return None, 'period_month must be between 1 and 12'
+        else:
+            period_month, period_quarter = None, _whole_number(merged.get('period_quarter'))
+            if not 1 <= period_quarter <= 4:
+                return None, 'period_quarter must be between 1 and 4'
+    except (TypeError, ValueError):
+        return None, 'period and rating values must be whole numbers'
+    if rating is not None and not 1 <= rating <= 5:
+        return None, 'performance_rating must be between 1 and 5'
+
+    row = {
+        'employee_id': employee_id,
+        'feedback_type': feedback_type,
+        'period_year': period_year,
+        'period_month': period_month,
+        'period_quarter': period_quarter,
+        'performance_rating': rating,
+    }
+    not_text = [field for field in FEEDBACK_TEXT_FIELDS if not isinstance(merged.get(field, ''), str)]
+    if not_text:
+        return None, f"{', '.join(not_text)} must be text"
+    row.update({field: merged.get(field, '') for field in FEEDBACK_TEXT_FIELDS})
+    return row, None
+
+def create_bulk_feedback(manager, entries, defaults=None):
+    """Validate and insert feedback for many reports in one transaction.
+
+    `defaults` (e.g. feedback_type and period) apply to every entry unless the
+    entry overrides them. All employees are authorized with a single scope
+    query, and nothing is written unless every entry is valid.
+    """
+    from app import db
+    from models import Employee, Feedback
+    from sqlalchemy import insert, select
+
+    result = {
+        'success': False,
+        'count': 0,
+        'errors': []
+    }
+    if not entries:
+        result['errors'].append('No feedback entries submitted')
+        return result
+    if len(entries) > BULK_FEEDBACK_LIMIT:
+        result['errors'].append(f'At most {BULK_FEEDBACK_LIMIT} entries per submission')
+        return result
+
+    rows, seen = [], set()
+    for number, entry in enumerate(entries, start=1):
+        row, error = _parse_feedback_entry(entry, defaults or {})
+        if error is None:
+            key = (row['employee_id'], row['period_year'], row['period_month'], row['period_quarter'])
+            if key in seen:
+                error = 'duplicate entry for this employee and period'
+            seen.add(key)
+        if error:
+            result['errors'].append(f'Entry {number}: {error}')
+        else:
+            rows.append(row)
+
+    # One statement decides which of the requested employees are in the manager's subtree
+    tree = manager.subordinates_cte()
+    requested = {row['employee_id'] for row in rows}
+    allowed = set(db.session.execute(
+        select(Employee.id).where(Employee.id.in_(requested), Employee.id.in_(select(tree.c.id)))
+    ).scalars()) if requested else set()
+    for row in rows:
+        if row['employee_id'] not in allowed:
+            result['errors'].append(f"Employee {row['employee_id']}: not found in your reporting tree")
+
+    if result['errors']:
+        return result
+
+    for row in rows:
+        row['manager_id'] = manager.id
+    try:
+        db.session.execute(insert(Feedback), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception('Bulk feedback insert failed')
+        result['errors'].append('Failed to save feedback')
+        return result
+
+    result['count'] = len(rows)
+    result['success'] = True
+    return result
+
+OFFBOARD_ACTIONS = ('deactivate', 'delete')
+# Equality filters accepted by offboard_employees, plus dol_before
+OFFBOARD_FILTERS = ('company', 'team', 'location', 'employment_type', 'billable_status')
+
+def offboard_employees(manager, ids=None, filters=None, action='deactivate', leaving_date=None):
+    """Deactivate or delete a selection (ids) or filtered set of the manager's reports in bulk.
+
+    Authorization is a single query restricting the targets to the manager's
+    subtree. 'deactivate' marks them Inactive and fills in a missing
+    dol_allianz. 'delete' removes them together with their feedback and
+    billing records, hands feedback they wrote to `manager`, and moves their
+    remaining reports up to the nearest ancestor that is not being removed.
+    Every step is a set-based statement per chunk of ids, in one transaction.
+    """
+    from app import db
+    from models import Employee, Feedback, BillingDetail, FeedbackArchive, BillingDetailArchive
+    from sqlalchemy import case, delete, func, select, update
+
+    result = {
+        'success': False,
+        'count': 0,
+        'errors': []
+    }
+    if action not in OFFBOARD_ACTIONS:
+        result['errors'].append(f"Unknown action {action}")
+        return result
+
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, '')}
+    not_text = sorted(key for key, value in filters.items() if not isinstance(value, str))
+    if not_text:
+        result['errors'].append(f"Filter values must be strings: {', '.join(not_text)}")
+        return result
+    conditions = []
+    if ids:
+        conditions.append(Employee.id.in_(ids))
+    for field in OFFBOARD_FILTERS:
+        if field in filters:
+            conditions.append(getattr(Employee, field) == filters[field])
+    if 'dol_before' in filters:
+        try:
+            conditions.append(Employee.dol_allianz <= datetime.strptime(filters['dol_before'], '%Y-%m-%d').date())
+        except (TypeError, ValueError):
+            result['errors'].append('dol_before must be a YYYY-MM-DD date')
+            return result
+    unknown = set(filters) - set(OFFBOARD_FILTERS) - {'dol_before'}
+    if unknown:
+        result['errors'].append(f"Unknown filters: {', '.join(sorted(unknown))}")
+        return result
+    if not conditions:
+        result['errors'].append('Select employees or give at least one filter')
+        return result
+
+    # The manager's subtree is the authorization boundary; the manager is never in it
+    tree = manager.subordinates_cte()
+    try:
+        targets = dict(db.session.execute(
+            select(Employee.id, Employee.manager_id).where(*conditions, Employee.id.in_(select(tree.c.id)))
+        ).all())
+    except Exception:
+        db.session.rollback()
+        result['errors'].append('Could not select the employees to offboard')
+        return result
+    if ids:
+        outside = len(set(ids) - set(targets))
+        if outside:
+            result['errors'].append(f'{outside} selected employees are not in your reporting tree')
+            return result
+    if not targets:
+        result['errors'].append('No matching employees in your reporting tree')
+        return result
+
+    target_ids = list(targets)
+    now = datetime.utcnow()
+    try:
+        with serialized_writes(db):
+            if action == 'deactivate':
+                leaving_date = leaving_date or datetime.utcnow().date()
+                for chunk in _chunks(target_ids):
+                    db.session.execute(
+                        update(Employee).where(Employee.id.in_(chunk))
+                        .values(employee_status='Inactive',
+                                dol_allianz=func.coalesce(Employee.dol_allianz, leaving_date),
+                                updated_at=now)
+                        .execution_options(synchronize_session=False))
+            else:
+                # Nearest surviving ancestor for everyone who reported to a removed employee
+                new_manager = {}
+                for employee_id, manager_id in targets.items():
+                    while manager_id in targets:
+                        manager_id = targets[manager_id]
+                    new_manager[employee_id] = manager_id
+                names = {}
+                for chunk in _chunks(set(new_manager.values())):
+                    names.update(db.session.execute(
+                        select(Employee.id, Employee.full_name).where(Employee.id.in_(chunk))).all())
+                # One UPDATE per chunk of removed managers, mapping each to its new manager with
+                # CASE; every id is bound up to five times, hence the smaller chunks.
+                # Removed employees get re-pointed too, which is harmless as they are deleted below
+                for chunk in _chunks(target_ids, size=LOOKUP_CHUNK_SIZE // 5):
+                    db.session.execute(
+                        update(Employee).where(Employee.manager_id.in_(chunk))
+                        .values(manager_id=case({old: new_manager[old] for old in chunk}, value=Employee.manager_id),
+                                manager_name=case({old: names.get(new_manager[old]) for old in chunk},
+                                                  value=Employee.manager_id),
+                                updated_at=now)
+                        .execution_options(synchronize_session=False))
+
+                for chunk in _chunks(target_ids):
+                    for model in (Feedback, FeedbackArchive):
+                        db.session.execute(delete(model).where(model.employee_id.in_(chunk))
+                                           .execution_options(synchronize_session=False))
+                        db.session.execute(update(model).where(model.manager_id.in_(chunk))
+                                           .values(manager_id=manager.id, updated_at=now)
+                                           .execution_options(synchronize_session=False))
+                    for model in (BillingDetail, BillingDetailArchive):
+                        db.session.execute(delete(model).where(model.employee_id.in_(chunk))
+                                           .execution_options(synchronize_session=False))
+                    db.session.execute(delete(Employee).where(Employee.id.in_(chunk))
+                                       .execution_options(synchronize_session=False))
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['errors'].append(f'Failed to offboard employees: {str(e)}')
+        return result
+
+    result['count'] = len(target_ids)
+    result['success'] = True
+    return result
+
+def manager_chain(employee_id):
+    """Ids of employee_id and everyone above them up to the root (empty if there is no such employee).
+
+    Reassigning someone to employee_id creates a cycle exactly when they are
+    in this set, and the acting manager may only reassign to it when they are.
+    """
+    from app import db
+    from models import Employee
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
+
+    parent = aliased(Employee)
+    chain = select(Employee.id, Employee.manager_id).where(Employee.id == employee_id).cte('chain', recursive=True)
+    chain = chain.union(select(parent.id, parent.manager_id).join(chain, parent.id == chain.c.manager_id))
+    return set(db.session.execute(select(chain.c.id)).scalars())
+
+def move_employees(manager, new_manager_id, ids=None, from_manager_id=None):
+    """Reassign employees (ids) or a whole team (everyone reporting to from_manager_id) to a new manager.
+
+    Moved employees keep their own reports, so complete branches move with
+    them. One query authorizes the moved set against the acting manager's
+    subtree, and one walks the new manager's ancestor chain to check both
+    that the new manager is within reach and that no moved employee would
+    end up under themselves. The move itself is a single UPDATE that also
+    refreshes manager_name, committed in one transaction.
+    """
+    from app import db
+    from models import Employee
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import aliased
+
+    result = {
+        'success': False,
+        'count': 0,
+        'errors': []
+    }
+    if not ids and from_manager_id is None:
+        result['errors'].append('Select employees or a team to move')
+        return result
+
+    # New manager's chain up to the root: authorizes the target and detects cycles
+    ancestors = manager_chain(new_manager_id)
+    if new_manager_id not in ancestors:
+        result['errors'].append('New manager not found')
+        return result
+    if manager.id not in ancestors:
+        result['errors'].append('New manager is not in your reporting tree')
+        return result
+
+    tree = manager.subordinates_cte()
+    if ids:
+        selection = Employee.id.in_(ids)
+    else:
+        # A team outside the subtree simply yields nobody below
+        selection = Employee.manager_id == from_manager_id
+    moved = set(db.session.execute(
+        select(Employee.id).where(selection, Employee.id.in_(select(tree.c.id)))
+    ).scalars())
+    if ids and len(moved) != len(set(ids)):
+        result['errors'].append(f'{len(set(ids) - moved)} selected employees are not in your reporting tree')
+        return result
+    if not moved:
+        result['errors'].append('No employees to move')
+        return result
+    cycle = moved & ancestors
+    if cycle:
+        result['errors'].append(f'Cannot move employee {min(cycle)} under themselves or one of their reports')
+        return result
+
+    parent = aliased(Employee)
+    new_manager_name = select(parent.full_name).where(parent.id == new_manager_id).scalar_subquery()
+    now = datetime.utcnow()
+    try:
+        for chunk in _chunks(moved):
+            db.session.execute(
+                update(Employee).where(Employee.id.in_(chunk))
+                .values(manager_id=new_manager_id, manager_name=new_manager_name, updated_at=now)
+                .execution_options(synchronize_session=False))
+        db.session.execute(
+            update(Employee).where(Employee.id == new_manager_id, Employee.is_manager.isnot(True))
+            .values(is_manager=True, updated_at=now).execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['errors'].append(f'Failed to move employees: {str(e)}')
+        return result
+
+    result['count'] = len(moved)
+    result['success'] = True
+    return result
+
 def create_sample_data():
     """Create sample users if database is empty"""
     try:
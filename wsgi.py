@@ -0,0 +1,51 @@
+# wsgi.py
+"""Production entry point: gunicorn -c gunicorn.conf.py (serves wsgi:application)"""
+import logging
+import time
+from sqlalchemy.orm import configure_mappers
+from app import app, create_app
+
+logger = logging.getLogger(__name__)
+
+application = create_app()
+
+def prewarm():
+    """Do the work of the first requests before any traffic arrives.
+
+    Configures the ORM mappers, compiles every template and fills the shared
+    cache with the dashboards of the top PREWARM_DASHBOARDS managers (top-level
+    managers first). Run in the gunicorn master when the app is preloaded, so
+    every forked worker inherits the result. Failures are logged, never raised:
+    a worker that starts cold is better than one that does not start.
+    """
+    if not app.config.get('PREWARM_ENABLED', True):
+        return
+    started = time.perf_counter()
+    configure_mappers()
+
+    templates = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            templates += 1
+        except Exception as e:
+            logger.warning('Prewarm could not compile %s: %s', name, e)
+
+    dashboards = 0
+    from cache import NullCache, cache
+    if type(cache.backend) is not NullCache and app.config.get('PREWARM_DASHBOARDS', 0) > 0:
+        from models import Employee
+        from utils import get_scope_analytics
+        try:
+            with app.app_context():
+                managers = Employee.query.filter_by(is_manager=True)\
+                                         .order_by(Employee.manager_id.isnot(None), Employee.id)\
+                                         .limit(app.config['PREWARM_DASHBOARDS']).all()
+                for manager in managers:
+                    get_scope_analytics(manager)
+                    dashboards += 1
+        except Exception as e:
+            logger.warning('Prewarm could not fill the dashboard cache: %s', e)
+
+    logger.info('Prewarmed %d templates and %d dashboards in %.2fs',
+                templates, dashboards, time.perf_counter() - started)